@@ -7,17 +7,20 @@
 # Last updated: 2025-10-01
 
 # First we import the libraries relevant for this project
-from tkinter import Tk, Canvas, BOTH, Toplevel, Label
-from graph import Graph
+from tkinter import Tk, Canvas, BOTH
+from stained_glass_engine import StainedGlassEngine, GeometryWorker
+from collections import deque
+from latency import LatencyRecorder
+from canvas_export import exportPng
+from session_log import SessionLog
+from save_queue import SaveQueue, runWithRetries
+from ledger import EmailLedger
 from tkinter import messagebox, simpledialog
-import functools
-from time import perf_counter
-from datetime import datetime, date
+from time import perf_counter_ns
+from datetime import datetime, date, timedelta
 from random import randint, choice
 from os import path, getcwd, mkdir
-from csv import writer, reader, QUOTE_MINIMAL
-from PIL import Image
-import subprocess
+from csv import reader
 
 # The first variable declared is whether the program is the operant box version
 # for pigeons, or the test version for humans to view. The variable below is 
@@ -39,7 +42,20 @@ else:
     print("*** Running test version (no hardware) *** \n")
     
 # Global variables 
-TIME = 0 # Gives a metric for relevative efficiency
+CHECK_REGIONS = 0 # Checks the incremental regions against a full Graph.solve() (slow)
+MERGE_DISTANCE = 0.5 # Intersections closer than this (in pixels) become one vertex. 0 turns merging off
+DUPLICATE_LINE_DISTANCE = 2 # Strokes with both ends this close (in pixels) to an existing line are not drawn. 0 only rejects exact repeats
+THREADED_GEOMETRY = 1 # Finds the polygons of a stroke on a worker thread so the screen never freezes. 0 finds them before the next event
+POLL_MS = 5 # How often (in ms) the worker is checked for finished strokes
+FRAME_MS = 16 # The red guideline is redrawn at most once every FRAME_MS (about one display frame)
+EXPORT_SCALE = 2 # Saved .png images are this many times the size of the canvas
+THUMBNAIL_SIZE = (256, 192) # Largest size of the thumbnail saved next to each .png. None saves no thumbnail
+SAVE_EPS = 0 # Also saves the canvas as .eps with Tk postscript (slow, and needs Ghostscript to open)
+SYNC_RETRIES = 3 # Times sync_drive.sh is tried again after it fails, on the save queue
+SYNC_RETRY_S = 10 # Seconds before the first retry of sync_drive.sh, doubled for each one after
+LOG_FLUSH_S = 1 # Session data is written to its .csv at least this often (in seconds) while the session runs
+LOG_FLUSH_ROWS = 100 # ...or as soon as this many rows are waiting
+SAVE_EVENTS = 1 # Also writes the session data to a compact binary .events file next to the .csv (see session_events.py)
 
 if operant_box_version:
     data_folder_directory = "/home/blaisdelllab/Desktop/Data/P033c_HUMAN_data"
@@ -63,31 +79,22 @@ if operant_box_version:
             print("\n ** NEW DATA FOLDER FOR %s CREATED **")
     except FileExistsError:
         print("Data folder for %s exists.")
+
+# Saved canvases are recorded in the (append-only) ledger; the .csv is made
+# from it when the program is closed, or with "python ledger.py <ledger>"
+email_ledger_loc = f"{data_folder_directory}/P033c_human_email_data_StainedGlassData3.ledger"
+email_csv_loc = f"{data_folder_directory}/P033c_human_email_data_StainedGlassData3.csv"
     
 ## Define functions:
     
-# Timer (for debugging).
-# Remember to remove the @timer decorator calls if deleting this function.
-def timer(func):
-    @functools.wraps(func)
-    def wrapper_timer(*args, **kwargs):
-        tic = perf_counter()
-        value = func(*args, **kwargs)
-        toc = perf_counter()
-        elapsed_time = toc - tic
-        if TIME:
-            print(f"{func.__name__}: {elapsed_time:0.4f} seconds")
-        return value
-    return wrapper_timer
-
-class Point:
-    def __init__(self, coord, ind):
-        self.ind = ind
-        self.coord = coord
-
 class Paint:
-    def __init__(self, root):
+    # saveQueue and ledger are passed on from one canvas to the next, so
+    # saves are still written in order (see new_canvas) and the ledger is
+    # only checked once, when the program starts
+    def __init__(self, root, saveQueue=None, ledger=None):
         self.root = root
+        self.saveQueue = saveQueue if saveQueue is not None else SaveQueue()
+        self.ledger = ledger if ledger is not None else EmailLedger(email_ledger_loc, email_csv_loc)
         if operant_box_version:
             self.width, self.height = 1024, 768
             self.root.geometry(f"{self.width}x{self.height}+{self.width}+0")
@@ -127,7 +134,15 @@ class Paint:
         # variables needed for drawing
         self.x, self.y = None, None
         self.draw = False
-        self.guideLine = None
+        # The red guideline from the start of a line to the mouse. It is one
+        # canvas item, hidden when no line is started and moved as the mouse
+        # moves. Mouse moves only store the position, the guideline is
+        # redrawn at most once a frame (see redrawGuideLine)
+        self.guideLine = self.canvas.create_line(0, 0, 0, 0, fill="red", state="hidden")
+        self.guideShown = False
+        self.guideOnTop = False # False once anything is drawn over it
+        self.mouse = None
+        self.guideAfterId = None # the redrawGuideLine waiting to run, if any
 
         # store all demo label ids
         self.demoLabels = []
@@ -136,59 +151,73 @@ class Paint:
         self.demo = 0
         self.showLines = 1
         
-        # Below, we store all necessary data
-        self.currLineIndex = 0 # increment after every line drawn
-        self.currPointIndex = 0 # increment after every point of intersection is found
-
-        # Stores all lines and the lines they intersect with by their index
-        # {line0 : [(line1, line2), (line3, line4)... ], ...}
-        self.lines = {}
-
-        # Store all line ids in a list. When we need to remove lines, this is useful.
-        self.lineIds = []
-        
-        # An adjacency list to store all vertices and edges of our directed graph
-        self.graph = {}
-
-        # Stores all points of intersection
-        # {line0 : [P1, P2, ... ]} where P1, P2, etc. are Point objects defined in the Point class
-        self.intersects = {}
-
-        # Maps line intersect coords to pos coords
-        # {(lineIndex0, lineIndex1) : (x, y)}
-        self.lineToPosCoords = {}
-
-        # Maps point index to position coordinates
-        self.pointToPosCoords = {}
-
-        # Maps point position coordinates to indices
-        self.posCoordsToPoints = {}
-
-        # Maps point index (0-n) to their line indices (0-m)
-        self.pointToLineIndices = {}
-
-        # Stores all polygons and their ids
+        # Time of every step of every stroke, and of saving. A summary is
+        # written next to the session data at the end of the session
+        self.latency = LatencyRecorder()
+
+        # All the geometry of the canvas: lines, intersection points, the
+        # graph they form and its faces. Filled polygons come back from it
+        self.engine = StainedGlassEngine(MERGE_DISTANCE, DUPLICATE_LINE_DISTANCE, CHECK_REGIONS, self.latency)
+
+        # With THREADED_GEOMETRY the engine runs on a worker thread. Strokes
+        # waiting for their polygons are kept in order in self.pending as
+        # [start time, id of the line shown in the meantime], together with
+        # the calls that have to wait for them (see afterStrokes)
+        self.worker = GeometryWorker(self.engine) if THREADED_GEOMETRY else None
+        self.pending = deque()
+        self.polling = False
+
+        # The lines as the engine stored them, in the order they were drawn
+        self.lines = []
+
+        # Strokes not drawn because they repeat a line (exactly, nearly),
+        # as of the last stroke drawn
+        self.duplicateCounts = (0, 0)
+
+        # Canvas item of every line, by line index (the index in self.lines).
+        # Each line is created once and tagged "line", so all of them can be
+        # shown, hidden or raised with a single call
+        # {0 : id, 1 : id, ...}
+        self.lineIds = {}
+
+        # Stores the filled polygons still showing and their ids. Polygons
+        # covered by newer ones are deleted (see applyLine), so this holds
+        # one item per colored face on the canvas
         # {[p1,p2,...pn] : id, ...}
         self.polygons = {}
 
+        # Fill color of every polygon in self.polygons, so the canvas can be
+        # exported without reading it back from Tk
+        # {[p1,p2,...pn] : "#RRGGBB", ...}
+        self.polygonColors = {}
+
+        # Number of polygons filled in this session, including the ones
+        # since replaced
+        self.filledCount = 0
+
         # Create data objects
         self.start_time = datetime.now() # Set start time
+        self.start_ns = perf_counter_ns() # The same moment, for the times in the data records
         
         # Stores the name of the painter
         self.subject = "human"
         
-        # Data is written every time a peck happens
-        self.session_data_frame = [] #This where trial-by-trial data is stored
+        # Data is written every time a peck happens: write_data stores a
+        # record of raw numbers, and the SessionLog formats it (formatRow)
+        # and writes it to the .csv on its own thread while the session runs
+        self.data_file_loc = f"{data_folder_directory}/{self.subject}/P033c_{self.subject}_{self.start_time.strftime('%Y-%m-%d_%H.%M.%S')}_StainedGlassData3-human.csv" # location of written .csv
         data_headers = [
             "SessionTime", "IRI", "X1","Y1","PrevX","PrevY", "SizeOfLine", 
              "Event", "NPolygons","NDots", "NLines",  "NIslands", "NColors", 
              "BackgroundColor","StartTime", "Experiment", "P033_Phase",
-             "PrevReinforcersEarned", "BoxNumber",  "Subject",  "Date"
+             "PrevReinforcersEarned", "BoxNumber",  "Subject",  "Date",
+             "NExactDuplicateLines", "NNearDuplicateLines"
             ]
-        self.session_data_frame.append(data_headers) # First row of matrix is the column headers
+        events_file_loc = self.data_file_loc.replace(".csv", ".events") if SAVE_EVENTS else None
+        self.sessionLog = SessionLog(self.data_file_loc, data_headers, self.formatRow, LOG_FLUSH_S, LOG_FLUSH_ROWS, events_file_loc)
         
         
-        self.previous_response = datetime.now() # Will update with every peck
+        self.previous_response = self.start_ns # Will update with every peck
         
         # Stores the date of the painting
         self.date = date.today().strftime("%y-%m-%d")
@@ -250,78 +279,6 @@ class Paint:
         return color_choice
     
 
-    # Return true if line segments AB and CD intersect.
-    # This will be used in the findIntersects method
-    def hasIntersect(self, A, B, C, D):
-        def ccw(A,B,C):
-            return (C[1]-A[1]) * (B[0]-A[0]) > (B[1]-A[1]) * (C[0]-A[0])
-        return ccw(A,C,D) != ccw(B,C,D) and ccw(A,B,C) != ccw(A,B,D)
-
-    # Every time a line segment is drawn, we will call this function on that line segment
-    # For each line that the new line intersects, we will append the intersect coord (x, y) to 
-    # the values (lists) of both lines in self.intersects
-    # Return all intersects between line and all stored lines as a list of 2D points
-    @timer
-    def findIntersects(self, line):
-        # helper function to find intersection between 2 lines
-        def getIntersect(line1, line2):
-
-            xdiff = (line1[0][0] - line1[1][0], line2[0][0] - line2[1][0])
-            ydiff = (line1[0][1] - line1[1][1], line2[0][1] - line2[1][1])
-
-            def det(a, b):
-                return a[0] * b[1] - a[1] * b[0]
-
-            div = det(xdiff, ydiff)
-            if div == 0:
-                return None
-
-            d = (det(*line1), det(*line2))
-            x = det(d, xdiff) / div
-            y = det(d, ydiff) / div
-            return (x, y)
-
-        # loop through all stored lines, check intersect between line and each line l2 in list
-        for lineNum, l2 in self.lines.items():
-            if self.hasIntersect(line[0], line[1], l2[0], l2[1]) == False:
-                continue
-            p = getIntersect(line, l2)
-            if p is not None: # if line and l2 intersecting
-                self.lineToPosCoords[(lineNum, self.currLineIndex)] = p
-                self.pointToPosCoords[self.currPointIndex] = p
-                self.posCoordsToPoints[p] = self.currPointIndex
-
-                # add indices of intersecting lines (values) associated with point (key) to the pointToLineIndices dict
-                self.pointToLineIndices[self.currPointIndex] = [self.currLineIndex, lineNum]
-
-                # update self.intersects dict
-                self.intersects.setdefault(lineNum, []).append(Point(p, self.currPointIndex))
-                self.intersects.setdefault(self.currLineIndex, []).append(Point(p, self.currPointIndex))
-                
-                # sort lists in self.intersects
-                self.intersects[lineNum] = sorted(self.intersects[lineNum], key=lambda x : x.coord)
-                self.intersects[self.currLineIndex] = sorted(self.intersects[self.currLineIndex], key=lambda x : x.coord)
-
-                self.currPointIndex += 1
-
-    # Function to update self.graph after new shapes are drawn onto canvas
-    @timer
-    def updateEdges(self):
-        self.graph = {} # clear the graph
-
-        # identify all points that are not involved in a cycle
-        self.toExclude = set()
-        for points in self.intersects.values():
-            if len(points) == 1:
-                self.toExclude.add(points[0].ind)
-
-        for _list in self.intersects.values():
-            if len(_list) < 2: continue
-            for i in range(len(_list)-1):
-                u, v = _list[i], _list[i+1]
-                if (u.ind not in self.toExclude) and (v.ind not in self.toExclude):
-                    self.graph.setdefault(u, []).append(v)
-
     # draws a red dot at specified point
     def drawDot(self, point):
         r = 6
@@ -329,148 +286,140 @@ class Paint:
                                 fill="#FF0000", outline="#FF0000")
         return id
 
-    # function to find all new polygons since last shape drawn
-    def findNewPolygons(self):
-        def printPolygon(p, end='\n'):
-            for point in p:
-                print(self.posCoordsToPoints[point], end=' ')
-            print(end=end)
+    # True if a filled polygon has exactly the vertices of polygon, given as
+    # a list of (x, y) position coords
+    def isFilled(self, polygon):
+        return self.engine.isFilled(polygon)
 
-        # if graph contains only 1 directed edge, there are no polygons
-        if len(self.graph) <= 1:
-            return None
+    # True if a filled polygon has the same vertices as polygon, or a subset
+    # or superset of them. Such a polygon is not filled again
+    def overlapsFilled(self, polygon):
+        return self.engine.overlapsFilled(polygon)
 
-        g = Graph(self.graph) # passing in directed graph
-        regions = g.solve() # list of sublists containing point indices (0 - n)
-        
-        polygons = set()
-
-        # for each polygon
-        for r in regions:
-            # convert point index to position coords
-            polygon = [self.pointToPosCoords[p] for p in r] 
-
-            # reorder polygon vertices while preserving edge relationships
-            # we want the top-left-most vertex as the first item
-            forwardList = polygon + polygon
-            left = forwardList.index(min(polygon))
-            if forwardList[left][0] > forwardList[left + 1][0]:
-                forwardList.reverse() 
-                left = forwardList.index(min(polygon))
-            polygon = forwardList[left:left+len(polygon)]
-            polygons.add(tuple(polygon))
-
-        newPolygons = list(polygons - set(self.polygons.keys()))
-        
-        # if polygon is new
-        for polygon in newPolygons:
-            isNew = True
-            # if polygon is already in stored polygons, don't add it again
-            for curr in self.polygons.keys():
-                currSet, polygonSet = set(curr), set(polygon)
-                if currSet == polygonSet or len(currSet - polygonSet) == 0 or len(polygonSet - currSet) == 0: 
-                    isNew = False
-            
-            # if new polygon, fill with random color and add its vertices and id to the polygons dict
-            if isNew:
-                color = self.generateColor()
-                id = self.canvas.create_polygon(polygon, fill=color, outline=color, width=0.5)
-                self.polygons[polygon] = id # add new polygon to list
-                # 
-        
-        # print("polygons:")
-        # for p in self.polygons:
-        #     printPolygon(p, end=' | ')
-
-    # redraw all lines
-    def drawLines(self):
-        # remove all current lines
-        for id in self.lineIds:
-            self.canvas.delete(id)
-        
-        self.lineIds = []
-        
-        # draw all lines
-        for line in self.lines.values():
-            id = self.canvas.create_line(line, width=0.5)
-            self.lineIds.append(id)
-
-    # function to extend line by a factor of d. 
-    # this is useful for intersection detection
-    def extendLine(self, line, d):
-        p1, p2 = line[0], line[1]
-        mag = ((p2[0]-p1[0])**2 + (p2[1]-p1[1])**2) ** (1/2) # magnitude
-        
-        if mag != 0:
-            # new coords
-            x1 = p1[0] - d * (p2[0]-p1[0]) / mag
-            y1 = p1[1] - d * (p2[1]-p1[1]) / mag
-            x2 = p2[0] + d * (p2[0]-p1[0]) / mag
-            y2 = p2[1] + d * (p2[1]-p1[1]) / mag
-        else:
-            # new coords
-            x1 = p1[0] - d * (p2[0]-p1[0])
-            y1 = p1[1] - d * (p2[1]-p1[1])
-            x2 = p2[0] + d * (p2[0]-p1[0])
-            y2 = p2[1] + d * (p2[1]-p1[1])
-        
-        return [(x1, y1), (x2, y2)]
-
-    # draw line onto canvas, update data
+    # draw line onto canvas, update data. With THREADED_GEOMETRY the line
+    # is shown right away and filled in by applyLine once the worker is done
     def drawLine(self, line):
-        # increase line length slightly
-        line = self.extendLine(line, 3)
-
-        # sort line endpoints
-        # if line is already in list, don't do anything
-        line = sorted(line)
-        if line in self.lines.values():
+        start = perf_counter_ns()
+        if self.worker is None:
+            self.applyLine(start, *self.engine.addLineSnapshot(line[0], line[1]))
+            return
+        rawId = self.canvas.create_line(line, width=0.5, tags="line", state=self.lineState())
+        self.guideOnTop = False
+        self.pending.append([start, rawId])
+        self.worker.submit(line)
+        if not self.polling:
+            self.polling = True
+            self.root.after(POLL_MS, self.pollStrokes)
+
+    # fill the new polygons of a line the engine has added, and draw the
+    # line. rawId is the item shown for the line while it was in flight
+    def applyLine(self, start, result, storedLine, duplicateCounts, rawId=None):
+        self.duplicateCounts = duplicateCounts
+        if result is None:
+            if rawId is not None: self.canvas.delete(rawId)
             print("line already drawn")
             return
+        newPolygons, replacedPolygons = result
+        self.lines.append(storedLine)
+        tic = perf_counter_ns()
 
-        # find intersects between new line and all existing lines
-        self.findIntersects(line)
-        
-        # add new line to lines dict
-        self.lines[self.currLineIndex] = line
-
-        # increment current line number
-        self.currLineIndex += 1
-
-        # update edges
-        self.updateEdges()
+        # delete the polygons the line replaced, which the new polygons
+        # cover completely
+        for polygon in replacedPolygons:
+            self.canvas.delete(self.polygons.pop(polygon))
+            del self.polygonColors[polygon]
 
-        # find all polygons and fill them
-        self.findNewPolygons()
-
-        # draw all lines onto canvas
-        if self.showLines: self.drawLines()
+        # fill each new polygon with a random color and add its id to the polygons dict
+        for polygon in newPolygons:
+            color = self.generateColor()
+            id = self.canvas.create_polygon(polygon, fill=color, outline=color, width=0.5)
+            self.polygons[polygon] = id # add new polygon to list
+            self.polygonColors[polygon] = color
+        self.filledCount += len(newPolygons)
+
+        tic = self.latency.lap("fill", tic)
+
+        # draw the new line (moving the item shown in the meantime onto the
+        # stored line), and keep all lines above the new fills
+        if rawId is not None:
+            self.canvas.coords(rawId, *storedLine[0], *storedLine[1])
+            self.lineIds[len(self.lines) - 1] = rawId
+        else:
+            self.lineIds[len(self.lines) - 1] = self.canvas.create_line(storedLine, width=0.5, tags="line",
+                                                                        state=self.lineState())
+        if newPolygons:
+            self.canvas.tag_raise("line")
+        self.latency.lap("lines", tic)
 
         if self.demo:
             self.drawDemoLabels()
 
-    @timer
+        # from the peck to the filled polygons on screen
+        self.latency.lap("drawLine", start)
+        self.guideOnTop = False
+
+    # apply the strokes the worker has finished, and keep polling while
+    # strokes are still in flight
+    def pollStrokes(self):
+        self.applyStrokes(self.worker.ready())
+        if self.pending:
+            self.root.after(POLL_MS, self.pollStrokes)
+        else:
+            self.polling = False
+
+    # apply worker results, oldest first, each after the calls queued ahead of it
+    def applyStrokes(self, results):
+        for result in results:
+            self.runWaitingCalls()
+            start, rawId = self.pending.popleft()
+            self.applyLine(start, *result, rawId)
+        self.runWaitingCalls()
+
+    def runWaitingCalls(self):
+        while self.pending and callable(self.pending[0]):
+            self.pending.popleft()()
+
+    # wait for the worker and apply every stroke still in flight
+    def finishStrokes(self):
+        if self.worker is not None:
+            self.worker.wait()
+            self.applyStrokes(self.worker.ready())
+
+    # call func once the strokes in flight have been drawn, so it sees the
+    # canvas as it would have been had they been drawn right away
+    def afterStrokes(self, func):
+        if self.pending:
+            self.pending.append(func)
+        else:
+            func()
+
     def drawDemoLabels(self):
+        tic = perf_counter_ns()
+        if self.worker is not None: self.worker.wait() # only read the engine while the worker is idle
         for id in self.demoLabels:
             self.canvas.delete(id)
         self.demoLabels = []
 
         # draw edges
-        for u in self.graph:
-            for v in self.graph[u]:
+        graph = self.engine.buildGraph()
+        for u in graph:
+            for v in graph[u]:
                 id = self.canvas.create_line((*u.coord, *v.coord), width=2, fill="blue", arrow='last')
                 self.demoLabels.append(id)
 
         # draw point numbers
-        for point, coord in self.pointToPosCoords.items():
-            id = self.canvas.create_text(coord[0], coord[1] + 14, text=f"{point}")
+        for point in self.engine.points:
+            id = self.canvas.create_text(point.coord[0], point.coord[1] + 14, text=f"{point.ind}")
             self.demoLabels.append(id)
 
         # draw points
-        for point in self.lineToPosCoords.values():
-            id = self.drawDot(point)
+        for point in self.engine.points:
+            id = self.drawDot(point.coord)
             self.demoLabels.append(id)
 
+        self.latency.lap("demoLabels", tic)
+        self.guideOnTop = False
+
 # Keybound commands:
     
     # callback for left click
@@ -478,38 +427,68 @@ class Paint:
         # Write a data event on every press
         if self.draw:
             self.drawLine([(self.x, self.y), (event.x, event.y)])
-            if self.guideLine: self.canvas.delete(self.guideLine)
+            self.hideGuideLine()
             self.draw = False
             self.x, self.y = None, None
         else:
             self.x, self.y = event.x, event.y
             self.draw = True
-        # Write data for click
-        self.write_data(event)
+        # Write data for click, once the line (if any) is drawn so the row
+        # counts it
+        now = perf_counter_ns()
+        self.afterStrokes(lambda: self.write_data(event, now))
 
     # callback for right click
     def onRightButton(self, event):
         if self.draw:
-            self.canvas.delete(self.guideLine)
+            self.hideGuideLine()
             self.draw = False
             self.x, self.y = None, None
 
-    # callback for mouse move
+    # callback for mouse move. Motion events can come hundreds of times a
+    # second, so they only store the position and schedule one redraw of
+    # the guideline for the next frame
     def onMouseMove(self, event):
-        # redraw guideline
-        if self.guideLine: self.canvas.delete(self.guideLine)
-        if self.x is not None and self.y is not None:
-            self.guideLine = self.canvas.create_line((self.x, self.y, event.x, event.y), fill="red")
+        tic = perf_counter_ns()
+        self.mouse = (event.x, event.y)
+        if self.guideAfterId is None and self.x is not None:
+            self.guideAfterId = self.root.after(FRAME_MS, self.redrawGuideLine)
+        self.latency.lap("hover", tic)
+
+    # move the guideline to the last mouse position
+    def redrawGuideLine(self):
+        tic = perf_counter_ns()
+        self.guideAfterId = None
+        if self.x is not None and self.y is not None and self.mouse is not None:
+            self.canvas.coords(self.guideLine, self.x, self.y, *self.mouse)
+            if not self.guideShown:
+                self.canvas.itemconfigure(self.guideLine, state="normal")
+                self.guideShown = True
+            if not self.guideOnTop:
+                self.canvas.tag_raise(self.guideLine)
+                self.guideOnTop = True
+        self.latency.lap("guideLine", tic)
+
+    # drop a guideline redraw that has not run yet, before the canvas is
+    # destroyed
+    def cancelGuideLine(self):
+        if self.guideAfterId is not None:
+            self.root.after_cancel(self.guideAfterId)
+            self.guideAfterId = None
+
+    def hideGuideLine(self):
+        if self.guideShown:
+            self.canvas.itemconfigure(self.guideLine, state="hidden")
+            self.guideShown = False
+
+    # state of the line items, "normal" (shown) or "hidden"
+    def lineState(self):
+        return "normal" if self.showLines else "hidden"
 
     def toggleLines(self, event):
-        if not self.showLines:
-            self.drawLines()
-            self.showLines = 1
-        else:
-            # remove all current lines
-            for id in self.lineIds:
-                self.canvas.delete(id)
-            self.showLines = 0
+        self.finishStrokes()
+        self.showLines = 0 if self.showLines else 1
+        self.canvas.itemconfigure("line", state=self.lineState())
 
     def toggleDemo(self, event):
         if not self.demo:
@@ -521,11 +500,14 @@ class Paint:
             self.demoLabels = []
             self.demo = 0
         
-    def write_data(self, event):
-        # This function writes a new data line after EVERY peck. Data is
-        # organized into a matrix (just a list/vector with two dimensions,
-        # similar to a table). This matrix is appended to throughout the 
-        # session, then written to a .csv once at the end of the session.
+    def write_data(self, event, now=None):
+        # This function writes a new data line after EVERY peck. Only the
+        # raw numbers are stored here, as a record for the SessionLog, which
+        # turns it into a row of the .csv (see formatRow) in the background.
+        # now is the perf_counter_ns time of the peck (the row may be written
+        # a little later)
+        if now is None:
+            now = perf_counter_ns()
         if event != None: 
             x, y = event.x, event.y
             self.dot_counter += 1
@@ -533,74 +515,123 @@ class Paint:
         else: # There are certain data events that are not pecks.
             x, y = "NA", "NA"   
             outcome = "SessionEnds"
-        
-        # Line length calcultion
-        if "NA" not in [self.PrevX, self.PrevY, x, y]:
-            line_length = int(((x-self.PrevX)**2 + (y-self.PrevY)**2) ** 0.5) # Length of line rounded to nearest pixel
-        else:
-            line_length = "NA"
-            
-        self.session_data_frame.append([
-            str(datetime.now() - self.start_time), # SessionTime as datetime object
-            str(datetime.now() - self.previous_response), # IRI
+
+        self.sessionLog.record((
+            now, # Time of the peck
+            self.previous_response, # Time of the previous peck
             x, # X coordinate of a peck
             y, # Y coordinate of a peck
             self.PrevX, # Previous x coordinate
             self.PrevY, # Previous y coordinate
-            line_length,
             outcome,
-            len(self.polygons) - 1, # Number of polygons w/o background (?)
+            self.filledCount - 1, # Number of polygons w/o background (?)
             self.dot_counter, # Number of points
             len(self.lineIds) - 4, # Number of lines
+            self.background_color,
+            self.duplicateCounts[0], # Strokes not drawn because they repeat a line exactly
+            self.duplicateCounts[1] # Strokes not drawn because they nearly repeat a line
+            ))
+        
+        # Update the "previous" response time
+        if event != None:
+            self.previous_response = now
+            self.PrevX = x
+            self.PrevY = y
+
+    # Turns a record from write_data into a row of the data .csv (the
+    # columns of data_headers in __init__). Run on the SessionLog's thread
+    def formatRow(self, record):
+        (now, previous, x, y, prevX, prevY, outcome, nPolygons, nDots, nLines,
+         background_color, nExact, nNear) = record
+        
+        # Line length calcultion
+        if "NA" not in [prevX, prevY, x, y]:
+            line_length = int(((x-prevX)**2 + (y-prevY)**2) ** 0.5) # Length of line rounded to nearest pixel
+        else:
+            line_length = "NA"
+        
+        session_time = timedelta(microseconds=(now - self.start_ns) // 1000)
+        return [
+            session_time, # SessionTime (written as str(timedelta))
+            timedelta(microseconds=(now - previous) // 1000), # IRI
+            x, y, prevX, prevY,
+            line_length,
+            outcome,
+            nPolygons, nDots, nLines,
             self.num_islands, # EMPTY
             "NA", # "N colors",
-            self.background_color,
+            background_color,
             self.start_time,
             self.experiment,
             self.P033_phase,
             self.prev_reinforcers_earned,
             self.box_num,
             self.subject,
-            date.today() # Today's date as "MM-DD-YYYY"
-            ])
-        
-        # Update the "previous" response time
-        if event != None:
-            self.previous_response = datetime.now()
-            self.PrevX = x
-            self.PrevY = y
-        
-        data_headers = [
-            "SessionTime", "IRI", "X1","Y1","PrevX","PrevY", "SizeOfLine", 
-             "Event", "NPolygons","NDots", "NLines",  "NIslands", "NColors", 
-             "BackgroundColor","StartTime", "Experiment", "P033_Phase",
-             "PrevReinforcersEarned", "BoxNumber",  "Subject",  "Date"
+            (self.start_time + session_time).date(), # Date of the peck
+            nExact, nNear
             ]
 
-        
     def write_comp_data(self):
-        # The following function creates a .csv data document. It is once
-        # the session finishes (SessionEnded). If the first time the 
-        # function is called, it will produce a new .csv out of the
-        # session_data_matrix variable, named after the subject, date, and
-        # training phase.
+        # The following function finishes the .csv data document. It is
+        # called once the session finishes (SessionEnded): the end of
+        # session row is added and the file is closed (see
+        # write_session_file). The file is named after the subject, date,
+        # and training phase.
         self.write_data(None) # Writes end of session row to df
-        myFile_loc = f"{data_folder_directory}/{self.subject}/P033c_{self.subject}_{self.start_time.strftime('%Y-%m-%d_%H.%M.%S')}_StainedGlassData3-human.csv" # location of written .csv
-        
-        # This loop writes the data in the matrix to the .csv              
-        edit_myFile = open(myFile_loc, 'w', newline='')
-        with edit_myFile as myFile:
-            w = writer(myFile, quoting=QUOTE_MINIMAL)
-            w.writerows(self.session_data_frame) # Write all event/trial data 
-            print(f"\n- Data file written to {myFile_loc}")
+        self.write_session_file()
+
+    # Writes the session data still waiting in the SessionLog and closes
+    # the session's .csv. Also run on the save queue
+    def write_session_file(self):
+        tic = perf_counter_ns()
+        self.sessionLog.close()
+        print(f"\n- Data file written to {self.data_file_loc}")
+        self.latency.lap("writeCompData", tic)
+
+    # Writes the p50/p95/max time of every timed step (see LatencyRecorder)
+    # to a .csv next to the session data file. Called last, after saving
+    def write_latency_summary(self):
+        summary_loc = self.data_file_loc.replace(".csv", "_Latency.csv")
+        self.latency.writeSummary(summary_loc)
+        print(f"- Latency summary written to {summary_loc}")
+
+    # The filled polygons with their colors, in the order they are drawn,
+    # and the lines if they are shown: everything exportPng draws, copied so
+    # the canvas can go on changing
+    def snapshot(self):
+        polygons = [(polygon, self.polygonColors[polygon]) for polygon in self.polygons]
+        lines = list(self.lines) if self.showLines else []
+        return polygons, lines
+
+    # Saves the canvas as file_name.png (EXPORT_SCALE times the size of the
+    # canvas, plus a thumbnail) from the stored geometry, and also as
+    # file_name.eps with SAVE_EPS. Returns the path of the .png
+    def export_canvas(self, file_name):
+        tic = perf_counter_ns()
+        polygons, lines = self.snapshot()
+        exportPng(file_name + ".png", polygons, lines, self.width, self.height, EXPORT_SCALE, THUMBNAIL_SIZE)
+        tic = self.latency.lap("export", tic)
+        if SAVE_EPS:
+            self.canvas.postscript(file=file_name + ".eps", colormode="color")
+            self.latency.lap("postscript", tic)
+        return file_name + ".png"
             
     def exit_program(self, event):
         print("Escape key pressed")
+        self.finishStrokes()
         # Remove lines from drawing (can add back in with keybound command)
         self.toggleLines("event")
         print("- Lines removed from Canvas")
         self.write_comp_data()
         self.save_file()
+        self.write_latency_summary()
+        if self.saveQueue.pending():
+            print(f"- Waiting for {self.saveQueue.pending()} save(s) to finish")
+            self.saveQueue.wait()
+        n = self.ledger.compact(email_csv_loc)
+        print(f"- Email data file ({n} saved canvases) written to {email_csv_loc}")
+        if self.worker is not None: self.worker.stop()
+        self.cancelGuideLine()
         self.canvas.destroy()
         self.root.after(1, self.root.destroy())
         
@@ -610,12 +641,14 @@ class Paint:
     
     def new_canvas(self):
         print("<n> key pressed")
-        self.write_comp_data() # Save data
+        self.finishStrokes()
+        self.write_data(None) # Writes end of session row to df
         # First, ask if the human would like to save their artwork.
         list_of_options = ["Masterpiece", "Artwork", "Piece", "Portrait",
                            "Handiwork", "Magnum Opus", "Craft"]
         rand_select = choice(list_of_options)
 
+        artwork = None
         if messagebox.askyesno("Save?", f"Save your {rand_select}? \n (canvas will be emailed to you)"):
             # Ask for Name and Email
             name = simpledialog.askstring("Name", "Enter your name: (press enter to continue)", parent=self.root)
@@ -630,65 +663,18 @@ class Paint:
             if twitter is None:
                 twitter = "Not Provided"  # allow blank if user cancels
 
-            # Temporary "Saving..." popup
-            saving = Toplevel(self.root)
-            saving.title("Saving")
-            saving.transient(self.root)
-            saving.resizable(False, False)
-            Label(saving, text="Saving Your Artwork...", padx=20, pady=14).pack()
-
-            # Make sure it actually appears before we start the blocking work
-            saving.lift()
-            try:
-                saving.attributes("-topmost", True)
-            except Exception:
-                pass
-            saving.update_idletasks()
-            saving.after(10, lambda: saving.attributes("-topmost", False))  # optional
-
-            # Save canvas file 
             now = datetime.now()
             img_file_name = f"{self.save_directory}/{name}_{now.strftime('%m-%d-%Y_Time-%H-%M-%S')}_stained_glass_human"
-            img_fileps = img_file_name + ".eps"
-            self.canvas.postscript(file=img_fileps, colormode="color")
-
-            # Update email .csv file
-            myFile_loc = f"{data_folder_directory}/P033c_human_email_data_StainedGlassData3.csv"
-            try:
-                with open(myFile_loc, newline='') as csvfile:
-                    csv_reader = reader(csvfile)
-                    email_data_matrix = list(csv_reader)
-                    if len(email_data_matrix) == 0:
-                        email_data_matrix = [["ImagePath", "Name", "Email", "TwitterHandle", "SavedAt"]]
-            except FileNotFoundError:
-                email_data_matrix = [["ImagePath", "Name", "Email", "TwitterHandle", "SavedAt"]]
-
-            email_data_matrix.append([img_fileps, name, email, twitter, now.isoformat(timespec="seconds")])
-
-            with open(myFile_loc, 'w', newline='') as myFile:
-                w = writer(myFile, quoting=QUOTE_MINIMAL)
-                w.writerows(email_data_matrix)
-                print(f"\n- Email data file written to {myFile_loc}")
-
-            # Optional: sync Google Drive if operant box
-            if operant_box_version:
-                try:
-                    subprocess.run(
-                        ["/bin/bash", "/home/blaisdelllab/Desktop/Hardware_Code/sync_drive.sh"],
-                        check=True
-                    )
-                    print("\n- Google Drive updated")
-                except Exception as e:
-                    print(f"ERROR refreshing Google Drive: {e}")
-
-            # Done: close the temporary popup and show the final message
-            try:
-                saving.destroy()
-            except Exception:
-                pass
-
-            messagebox.showinfo("File Save", "File saved! Thank you.")
+            if SAVE_EPS: # Tk can only be used from here, so this one is not on the save queue
+                tic = perf_counter_ns()
+                self.canvas.postscript(file=img_file_name + ".eps", colormode="color")
+                self.latency.lap("postscript", tic)
+            polygons, lines = self.snapshot()
+            artwork = (img_file_name, polygons, lines, [name, email, twitter, now.isoformat(timespec="seconds")])
 
+        # Everything is written (and synced) on the save queue, from copies
+        # of the canvas, so the next visitor does not wait for it
+        self.saveQueue.submit(self.save_session, artwork)
 
         # Old version 2025-09-30
         """
@@ -722,8 +708,10 @@ class Paint:
         """
 
         # Last up, we start a new paint canvas:
+        if self.worker is not None: self.worker.stop()
+        self.cancelGuideLine()
         self.canvas.destroy()
-        paint = Paint(self.root)
+        paint = Paint(self.root, self.saveQueue, self.ledger)
         print("New canvas presented")
         # Keybind commands
         root.bind("<ButtonPress-1>", paint.onLeftButton)
@@ -732,10 +720,38 @@ class Paint:
         root.bind("<space>", paint.toggleDemo)
         root.bind("l", paint.toggleLines)
         root.bind("<space>", lambda event: paint.new_canvas())
-        
-        
 
-    # This builds a popup save_file window and saves as a .eps file
+        if artwork is not None:
+            messagebox.showinfo("File Save", "Thank you! Your artwork is being saved.")
+
+    # Saves a finished session on the save queue: the session data, the
+    # image and email data if the visitor saved their canvas, the Google
+    # Drive sync and, last, the latency summary. artwork is a copy made by
+    # new_canvas; nothing else uses this Paint any more
+    def save_session(self, artwork):
+        self.write_session_file()
+        if artwork is not None:
+            img_file_name, polygons, lines, details = artwork
+            tic = perf_counter_ns()
+            img_filepng = img_file_name + ".png"
+            exportPng(img_filepng, polygons, lines, self.width, self.height, EXPORT_SCALE, THUMBNAIL_SIZE)
+            tic = self.latency.lap("export", tic)
+
+            # Record the email data (one fsynced append, see ledger.py)
+            self.ledger.append([img_filepng] + details)
+            print(f"\n- Email data recorded in {email_ledger_loc}")
+            tic = self.latency.lap("emailLedger", tic)
+
+            # Optional: sync Google Drive if operant box
+            if operant_box_version:
+                if runWithRetries(["/bin/bash", "/home/blaisdelllab/Desktop/Hardware_Code/sync_drive.sh"],
+                                  SYNC_RETRIES, SYNC_RETRY_S):
+                    print("\n- Google Drive updated")
+                self.latency.lap("syncDrive", tic)
+
+        self.write_latency_summary()
+
+    # This builds a popup save_file window and saves as a .png file
     def save_file(self):
         list_of_options = ["Masterpiece", "Artwork", "Piece", "Portrait",
                            "Handiwork", "Magnum Opus", "Craft"]
@@ -746,12 +762,7 @@ class Paint:
             filepng = file_name + ".png"
     
             if not path.exists(filepng) or messagebox.askyesno("File already exists", "Overwrite?"):
-                fileps = file_name + ".eps"
-    
-                self.canvas.postscript(file=fileps)
-                Image.open(fileps)
-                #img.save(filepng, 'png')
-                #os.remove(fileps)
+                self.export_canvas(file_name)
     
                 messagebox.showinfo("File Save", "File saved!")
             else:
@@ -0,0 +1,41 @@
+# P033c - Stained Art Program for Humans
+
+# Off-screen export of a finished canvas. The filled polygons and their
+# colors (and, if they are shown, the lines) are drawn straight onto a
+# Pillow image from the stored geometry, so a canvas can be saved as a .png
+# at any resolution without Tk postscript or Ghostscript, without touching
+# the canvas on screen, and from any thread.
+
+# Last updated: 2026-10-17
+
+# Import libraries
+from os import path
+
+from PIL import Image, ImageDraw
+
+# Draw polygons, a list of (polygon, color) in the order they were filled,
+# and then lines, a list of [(x1, y1), (x2, y2)], on top in black, onto a
+# width x height canvas magnified by scale. Returns the Pillow image
+def renderCanvas(polygons, lines=(), width=1024, height=768, scale=1, background="black"):
+    image = Image.new("RGB", (round(width * scale), round(height * scale)), background)
+    draw = ImageDraw.Draw(image)
+    for polygon, color in polygons:
+        draw.polygon([(x * scale, y * scale) for x, y in polygon], fill=color, outline=color)
+    lineWidth = max(1, round(0.5 * scale)) # the lines on the canvas are 0.5 wide
+    for line in lines:
+        draw.line([(x * scale, y * scale) for x, y in line], fill="black", width=lineWidth)
+    return image
+
+# Save the canvas (see renderCanvas) as a .png at pngPath, plus a copy no
+# larger than thumbnailSize (width, height) at <name>_thumb.png if
+# thumbnailSize is given. Returns the paths written
+def exportPng(pngPath, polygons, lines=(), width=1024, height=768, scale=1, thumbnailSize=None):
+    image = renderCanvas(polygons, lines, width, height, scale)
+    image.save(pngPath, compress_level=1) # the least compression is several times faster
+    paths = [pngPath]
+    if thumbnailSize is not None:
+        image.thumbnail(thumbnailSize)
+        thumbPath = path.splitext(pngPath)[0] + "_thumb.png"
+        image.save(thumbPath)
+        paths.append(thumbPath)
+    return paths
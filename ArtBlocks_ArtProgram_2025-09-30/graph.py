@@ -11,6 +11,7 @@
 
 # Import libraries
 from math import atan2, pi
+from bisect import bisect_left, insort
 
 class Graph:
     def __init__(self, g):
@@ -56,8 +57,15 @@ class Graph:
         return None
 
     def buildVertexAngles(self):
+        seen = set()
         for vi, edges in self.graph.items():
             for vj in edges:
+                # use every undirected edge once, however many lines list it,
+                # and skip edges from a vertex to itself
+                key = (min(vi.ind, vj.ind), max(vi.ind, vj.ind))
+                if vi.ind == vj.ind or key in seen: continue
+                seen.add(key)
+
                 # Step 1: duplicate each undirected edge to form two directed edges
                 e1, e2 = (vi, vj), (vj, vi)
 
@@ -66,9 +74,11 @@ class Graph:
                 self.vertexAngles.extend([(e1, self.findAngle(e1[0], e1[1])), 
                                           (e2, self.findAngle(e2[0], e2[1]))])
 
-        # Step 3: Sort list ascending by index and theta as primary and secondary keys
+        # Step 3: Sort list ascending by index and theta as primary and secondary keys.
+        # Edges at the same angle are ordered by the index of vj, so the result
+        # does not depend on the order of self.graph
         self.vertexAngles = sorted(self.vertexAngles, 
-                            key=lambda x: (x[0][0].ind, x[1]))
+                            key=lambda x: (x[0][0].ind, x[1], x[0][1].ind))
 
     def buildWedges(self):
         # Step 4: Combine consecutive entries in each group into a wedge
@@ -144,9 +154,177 @@ class Graph:
         #         toRemove = r
         # self.regions.remove(toRemove)
 
-    # this function sequentially calls all functions in our pipeline
-    def solve(self):
+    # same as buildRegions, but without the quadratic parts: the next unused
+    # wedge comes from a worklist walked once in sorted order instead of
+    # scanning self.used every time, and the next wedge is looked up in a
+    # successor map keyed by (v1, v2) instead of a binary search
+    def buildRegionsWorklist(self):
+        # Step 5: Sort wedge list using vi and vj as primary and secondary key
+        self.wedges = sorted(self.wedges, key=lambda x: (x[0].ind, x[1].ind))
+        successor = {} # {(v1, v2) : wedge}
+        for w in self.wedges:
+            successor.setdefault((w[0].ind, w[1].ind), w)
+
+        # Step 6: Mark all wedges as unused
+        self.used = {w:0 for w in self.wedges}
+
+        # Step 7: Find unused wedge W0 = (v1, v2, v3)
+        for w0 in self.wedges:
+            if self.used[w0]: continue
+            self.used[w0] = 1 # set w0 to used
+            ind0 = self.wedgeToIndices(w0)
+            nextFirst, nextSecond = ind0[1], ind0[2]
+            wedgeList = [ind0]
+
+            # Step 8: Search for next wedge wi = (v2, v3, vn) until w(i+1) and w(1) are contiguous
+            while True:
+                wi = successor[(nextFirst, nextSecond)] # O(1) lookup
+                self.used[wi] = 1 # set wi to used
+                ind = self.wedgeToIndices(wi)
+                nextFirst, nextSecond = ind[1], ind[2]
+                wedgeList.append(ind)
+                if (nextFirst == ind0[0]) or (nextSecond == ind0[1]): break
+
+            region = [x[1] for x in wedgeList]
+            # if region contains no repeating elements
+            if len(region) > 2 and len(region) == len(set(region)):
+                self.regions.append(region) # store region
+
+    # this function sequentially calls all functions in our pipeline.
+    # worklist=False uses the original buildRegions
+    def solve(self, worklist=True):
         self.buildVertexAngles()
         self.buildWedges()
-        self.buildRegions()
-        return self.regions
\ No newline at end of file
+        if worklist:
+            self.buildRegionsWorklist()
+        else:
+            self.buildRegions()
+        return self.regions
+
+# Keeps the faces of the planar graph between strokes. Rather than building a
+# new Graph and calling solve() after every line, update() is handed the edges
+# that were added and removed and only re-traces the faces passing through a
+# vertex whose edges changed. Each face is traced wedge by wedge the same way
+# Graph.buildRegions does it, and edges at the same angle around a vertex are
+# ordered by vertex index as in Graph.buildVertexAngles, so the regions are
+# the same as a full solve() of the same edges
+class IncrementalRegions:
+    def __init__(self):
+        self.coords = {} # {vi : (x, y)}
+        # neighbors of every vertex sorted by angle {vi : [(theta, vj), ...]}
+        self.rotation = {}
+        self.edgeCount = {} # {(vi, vj) : n} with vi < vj, n copies of the undirected edge
+        self.faceOf = {} # {(vi, vj) : faceId} for every directed edge
+        self.faces = {} # {faceId : [(v0, v1), (v1, v2), ...]} directed edges in order
+        self.faceRegions = {} # {faceId : [region, ...]} regions found in each face
+        self.nextFaceId = 0
+
+    # find angle of the line from vertex i to vertex j with respect to the horizontal
+    # (same as Graph.findAngle)
+    def findAngle(self, i, j):
+        y = self.coords[i][1] - self.coords[j][1]
+        x = self.coords[j][0] - self.coords[i][0]
+        if y == 0 and x == 0: return 0
+        res = atan2(y, x) * 180 / pi
+        return res if res >= 0 else (360+res)
+
+    # the wedge entered through directed edge (vi, vj) leaves vj towards the
+    # neighbor that comes just before vi in angle order
+    def nextEdge(self, vi, vj):
+        rot = self.rotation[vj]
+        k = bisect_left(rot, (self.findAngle(vj, vi), vi))
+        return (vj, rot[k-1][1])
+
+    # every region currently in the graph
+    def regions(self):
+        return [r for regions in self.faceRegions.values() for r in regions]
+
+    # apply added and removed edges, given as lists of (Point, Point) pairs.
+    # returns (newRegions, removedRegions)
+    def update(self, added, removed):
+        toRemove, toAdd = [], []
+        for u, v in removed:
+            key = (min(u.ind, v.ind), max(u.ind, v.ind))
+            self.edgeCount[key] -= 1
+            if self.edgeCount[key] == 0:
+                del self.edgeCount[key]
+                toRemove.append(key)
+        for u, v in added:
+            if u.ind == v.ind: continue
+            key = (min(u.ind, v.ind), max(u.ind, v.ind))
+            self.coords[u.ind], self.coords[v.ind] = u.coord, v.coord
+            self.edgeCount[key] = self.edgeCount.get(key, 0) + 1
+            if self.edgeCount[key] == 1:
+                toAdd.append(key)
+
+        # every face passing through a vertex whose edges change is destroyed
+        touched = {v for key in toRemove + toAdd for v in key}
+        oldFaces = set()
+        for v in touched:
+            for theta, u in self.rotation.get(v, ()):
+                oldFaces.add(self.faceOf[(u, v)])
+        leftover, removedRegions = [], []
+        for f in oldFaces:
+            for d in self.faces.pop(f):
+                del self.faceOf[d]
+                leftover.append(d)
+            removedRegions.extend(self.faceRegions.pop(f))
+
+        # update the angle order around the touched vertices
+        for vi, vj in toRemove:
+            for a, b in ((vi, vj), (vj, vi)):
+                rot = self.rotation[a]
+                del rot[bisect_left(rot, (self.findAngle(a, b), b))]
+                if not rot: del self.rotation[a]
+        for vi, vj in toAdd:
+            for a, b in ((vi, vj), (vj, vi)):
+                insort(self.rotation.setdefault(a, []), (self.findAngle(a, b), b))
+        for v in touched:
+            if v not in self.rotation: del self.coords[v]
+
+        # re-trace the faces through the leftover and new directed edges
+        newRegions = []
+        for d in leftover + toAdd + [(vj, vi) for vi, vj in toAdd]:
+            if d in self.faceOf or (min(d), max(d)) not in self.edgeCount:
+                continue
+            f = self.nextFaceId
+            self.nextFaceId += 1
+            darts, e = [], d
+            while True:
+                self.faceOf[e] = f
+                darts.append(e)
+                e = self.nextEdge(*e)
+                if e == d: break
+            self.faces[f] = darts
+            self.faceRegions[f] = self.traceFace(darts)
+            newRegions.extend(self.faceRegions[f])
+
+        # regions that were re-traced unchanged are neither new nor removed
+        counts = {}
+        for r in newRegions: counts[tuple(r)] = counts.get(tuple(r), 0) + 1
+        for r in removedRegions: counts[tuple(r)] = counts.get(tuple(r), 0) - 1
+        newRegions = [list(r) for r, n in counts.items() for _ in range(n)]
+        removedRegions = [list(r) for r, n in counts.items() for _ in range(-n)]
+        return newRegions, removedRegions
+
+    # find the regions of one face (a closed walk of directed edges) the same
+    # way Graph.buildRegions would: start from the lowest unused wedge, walk
+    # until the walk comes back around, keep the region if no vertex repeats
+    def traceFace(self, darts):
+        n = len(darts)
+        used = [False] * n
+        regions = []
+        for s in sorted(range(n), key=darts.__getitem__):
+            if used[s]: continue
+            used[s] = True
+            v1, v2 = darts[s]
+            region, i = [v2], s
+            while True:
+                i = (i + 1) % n
+                used[i] = True
+                nextFirst, nextSecond = darts[i][1], darts[(i+1) % n][1]
+                region.append(nextFirst)
+                if nextFirst == v1 or nextSecond == v2: break
+            if len(region) > 2 and len(region) == len(set(region)):
+                regions.append(region)
+        return regions
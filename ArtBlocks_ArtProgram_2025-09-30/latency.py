@@ -0,0 +1,110 @@
+# P033c - Stained Art Program for Humans
+
+# Per-stroke latency instrumentation. Every stage that is timed (the steps
+# of drawLine, rendering the canvas, saving) records its time in
+# nanoseconds from perf_counter_ns into a fixed-size ring buffer, so a long
+# session costs no more memory than a short one. At the end of a session
+# the p50/p95/max of every stage is written to a .csv next to the session
+# data, for the whole session and for each block of recordings, so it shows
+# when a session starts to lag.
+
+# Last updated: 2026-10-17
+
+# Import libraries
+from array import array
+from csv import writer
+from time import perf_counter_ns
+
+class RingBuffer:
+    # The last `capacity` values recorded, plus the count, total and maximum
+    # of everything ever recorded
+    __slots__ = ("values", "capacity", "count", "total", "max")
+
+    def __init__(self, capacity):
+        self.values = array('q')
+        self.capacity = capacity
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, ns):
+        if self.count < self.capacity:
+            self.values.append(ns)
+        else:
+            self.values[self.count % self.capacity] = ns
+        self.count += 1
+        self.total += ns
+        if ns > self.max: self.max = ns
+
+    # the most recent value, 0 if nothing was recorded yet
+    def last(self):
+        if not self.count: return 0
+        return self.values[(self.count - 1) % self.capacity]
+
+    # the values still in the buffer, oldest first, with the recording
+    # number (0-n) of the first one
+    def ordered(self):
+        if self.count <= self.capacity:
+            return 0, list(self.values)
+        split = self.count % self.capacity
+        return self.count - self.capacity, list(self.values[split:]) + list(self.values[:split])
+
+class LatencyRecorder:
+    # One RingBuffer per stage, created the first time the stage is recorded
+    def __init__(self, capacity=4096, blockSize=100):
+        self.capacity = capacity
+        self.blockSize = blockSize # recordings per block in the summary
+        self.buffers = {} # {stage : RingBuffer}
+
+    def record(self, stage, ns):
+        buffer = self.buffers.get(stage)
+        if buffer is None:
+            buffer = self.buffers[stage] = RingBuffer(self.capacity)
+        buffer.add(ns)
+
+    # record the time since tic (from perf_counter_ns) for stage, and return
+    # the current time so the next stage can start from it
+    def lap(self, stage, tic):
+        toc = perf_counter_ns()
+        self.record(stage, toc - tic)
+        return toc
+
+    # the most recent time of stage in nanoseconds, 0 if it was never recorded
+    def last(self, stage):
+        buffer = self.buffers.get(stage)
+        return buffer.last() if buffer is not None else 0
+
+    # the total time recorded for stage in nanoseconds
+    def total(self, stage):
+        buffer = self.buffers.get(stage)
+        return buffer.total if buffer is not None else 0
+
+    # rows of [Stage, Window, N, P50Ms, P95Ms, MaxMs, MeanMs]. The "all" row
+    # of a stage covers the whole session (its percentiles only the
+    # recordings still in the buffer), then one row per block of blockSize
+    # recordings
+    def summary(self):
+        rows = []
+        for stage, buffer in self.buffers.items():
+            first, values = buffer.ordered()
+            rows.append([stage, "all", buffer.count] + self.stats(values, buffer.max, buffer.total / buffer.count))
+            start = first - first % self.blockSize
+            for b in range(start, buffer.count, self.blockSize):
+                block = values[max(b - first, 0):b - first + self.blockSize]
+                if block:
+                    rows.append([stage, f"{max(b, first) + 1}-{min(b + self.blockSize, buffer.count)}", len(block)]
+                                + self.stats(block, max(block), sum(block) / len(block)))
+        return rows
+
+    # [p50, p95, max, mean] in milliseconds
+    def stats(self, values, maxNs, meanNs):
+        values = sorted(values)
+        p50 = values[min(len(values) - 1, len(values) // 2)]
+        p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+        return [round(ns / 1e6, 3) for ns in (p50, p95, maxNs, meanNs)]
+
+    def writeSummary(self, csvPath):
+        with open(csvPath, 'w', newline='') as f:
+            w = writer(f)
+            w.writerow(["Stage", "Window", "N", "P50Ms", "P95Ms", "MaxMs", "MeanMs"])
+            w.writerows(self.summary())
@@ -0,0 +1,158 @@
+# P033c - Stained Art Program for Humans
+
+# Append-only ledger of the saved canvases (image path, name, email,
+# Twitter handle, time saved). Every save appends one record and fsyncs it,
+# so a save takes the same time however many came before it, and a crash
+# can at worst lose the record being written, never the ones before it.
+# Each record is one line:
+#     <crc32 of the JSON, 8 hex digits> <JSON list of the fields>
+# When a ledger is opened, records that were cut off or do not match their
+# checksum are moved out to <ledger>.rejected. One writer at a time holds
+# the lock (<ledger>.lock), between threads and between processes. The CSV
+# handed to the gallery staff is made from the ledger by compact().
+
+# Usage: python ledger.py LEDGER [--out FILE.csv]   (write the CSV of a ledger)
+
+# Last updated: 2026-10-17
+
+# Import libraries
+import argparse
+import json
+import os
+import zlib
+from contextlib import contextmanager
+from csv import writer, reader, QUOTE_MINIMAL
+from threading import Lock
+
+try:
+    import fcntl # locks between processes; not on Windows, where only threads are locked out
+except ImportError:
+    fcntl = None
+
+HEADER = ["ImagePath", "Name", "Email", "TwitterHandle", "SavedAt"]
+
+class EmailLedger:
+    # Opens (or creates) the ledger at ledgerPath, checking and repairing it
+    # first. A new ledger starts with the rows of importCsv, if there is one
+    # (the email .csv written before there was a ledger)
+    def __init__(self, ledgerPath, importCsv=None):
+        self.path = ledgerPath
+        self.threadLock = Lock()
+        self.lockFile = open(ledgerPath + ".lock", "a")
+        with self.locked():
+            if not os.path.exists(ledgerPath) and importCsv is not None and os.path.exists(importCsv):
+                self.importRows(importCsv)
+            self.repair()
+            self.file = open(ledgerPath, "ab")
+
+    # hold the lock: no other thread or process writes the ledger meanwhile
+    @contextmanager
+    def locked(self):
+        with self.threadLock:
+            if fcntl is not None: fcntl.flock(self.lockFile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None: fcntl.flock(self.lockFile, fcntl.LOCK_UN)
+
+    # one record of the ledger, see the top of this file
+    def encode(self, fields):
+        data = json.dumps([str(field) for field in fields], ensure_ascii=False).encode()
+        return b"%08x %s\n" % (zlib.crc32(data), data)
+
+    # the fields of one line of the ledger, or None if it was cut off or damaged
+    def decode(self, line):
+        if not line.endswith(b"\n"): return None
+        try:
+            crc, data = line[:-1].split(b" ", 1)
+            if int(crc, 16) != zlib.crc32(data): return None
+            fields = json.loads(data)
+        except ValueError:
+            return None
+        return fields if isinstance(fields, list) else None
+
+    # add a record. The file is only appended to, and the record is on disk
+    # when this returns. A record that could not be written in full is cut
+    # off again, so the next one starts on a clean line
+    def append(self, fields):
+        record = self.encode(fields)
+        with self.locked():
+            end = self.file.seek(0, os.SEEK_END)
+            try:
+                self.file.write(record)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except OSError:
+                self.file.truncate(end)
+                raise
+
+    # every record, oldest first, skipping damaged ones
+    def rows(self):
+        if not os.path.exists(self.path): return []
+        with open(self.path, "rb") as f:
+            return [fields for fields in map(self.decode, f) if fields is not None]
+
+    # move damaged records (most likely a last one cut off by a crash) out to
+    # <ledger>.rejected. Returns the number of records moved
+    def repair(self):
+        if not os.path.exists(self.path): return 0
+        with open(self.path, "rb") as f:
+            lines = f.readlines()
+        good = [line for line in lines if self.decode(line) is not None]
+        if len(good) == len(lines): return 0
+        bad = [line for line in lines if self.decode(line) is None]
+        with open(self.path + ".rejected", "ab") as f:
+            f.writelines(line if line.endswith(b"\n") else line + b"\n" for line in bad)
+            f.flush()
+            os.fsync(f.fileno())
+        self.replace(self.path, lambda f: f.writelines(good), "wb")
+        print(f"- {len(bad)} damaged record(s) of {self.path} moved to {self.path}.rejected")
+        return len(bad)
+
+    # start the ledger with the rows of an email .csv (without its header)
+    def importRows(self, csvPath):
+        with open(csvPath, newline='') as csvfile:
+            rows = list(reader(csvfile))
+        if rows and rows[0] == HEADER: rows = rows[1:]
+        self.replace(self.path, lambda f: f.writelines(self.encode(row) for row in rows), "wb")
+        print(f"- {len(rows)} record(s) of {csvPath} copied into {self.path}")
+
+    # write the whole ledger as a .csv with a header row
+    def compact(self, csvPath):
+        with self.locked():
+            rows = self.rows()
+        def write(f):
+            w = writer(f, quoting=QUOTE_MINIMAL)
+            w.writerow(HEADER)
+            w.writerows(rows)
+        self.replace(csvPath, write, "w", newline='')
+        return len(rows)
+
+    # write a file with write(f) under a temporary name, then move it into
+    # place, so filePath is never left half written
+    def replace(self, filePath, write, mode, **kwargs):
+        tmpPath = filePath + ".tmp"
+        with open(tmpPath, mode, **kwargs) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, filePath)
+
+    def close(self):
+        self.file.close()
+        self.lockFile.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the .csv of an email ledger")
+    parser.add_argument("ledger", help="the .ledger file")
+    parser.add_argument("--out", help="the .csv to write (default: the ledger with .csv in place of .ledger)")
+    args = parser.parse_args()
+
+    ledger = EmailLedger(args.ledger)
+    out = args.out or os.path.splitext(args.ledger)[0] + ".csv"
+    n = ledger.compact(out)
+    ledger.close()
+    print(f"{n} record(s) written to {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# P033c - Stained Art Program for Humans
+
+# Background saving for the kiosk. When a visitor finishes, new_canvas
+# copies what has to be saved (the session data, the polygons and lines of
+# the canvas, the name and email) and hands it to a SaveQueue. The files
+# are written and the Google Drive sync is run on the queue's thread, so
+# the next visitor gets a fresh canvas straight away however slow the disk
+# or the sync is.
+
+# Last updated: 2026-10-17
+
+# Import libraries
+import subprocess
+from threading import Thread
+from queue import Queue
+from time import sleep
+
+class SaveQueue:
+    # Runs saves on a background thread, one at a time in the order they
+    # were submitted. A save that fails is printed and does not stop the
+    # ones after it
+    def __init__(self):
+        self.jobs = Queue() # (function, args) waiting to run
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            func, args = self.jobs.get()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"ERROR saving canvas: {e}")
+            self.jobs.task_done()
+
+    # run func(*args) on the save thread
+    def submit(self, func, *args):
+        self.jobs.put((func, args))
+
+    # number of saves submitted but not finished
+    def pending(self):
+        return self.jobs.unfinished_tasks
+
+    # block until every submitted save is done
+    def wait(self):
+        self.jobs.join()
+
+# Run command (a list, as for subprocess.run). If it fails or takes longer
+# than timeout seconds, try again up to retries more times, waiting delay
+# seconds before the first retry and twice as long before each one after.
+# Returns True if it succeeded
+def runWithRetries(command, retries=3, delay=10, timeout=300):
+    for attempt in range(retries + 1):
+        try:
+            subprocess.run(command, check=True, timeout=timeout)
+            return True
+        except Exception as e:
+            print(f"ERROR running {command[-1]} (attempt {attempt + 1} of {retries + 1}): {e}")
+        if attempt < retries:
+            sleep(delay * 2 ** attempt)
+    return False
@@ -0,0 +1,789 @@
+# P033c - Stained Art Program for Humans
+
+# Geometry of the stained glass canvas, kept apart from the Tkinter program
+# so it can be used without a display (from scripts, benchmarks or worker
+# threads). StainedGlassEngine takes the lines, finds where they cross,
+# keeps the planar graph and its faces (see graph.py), and hands back the
+# polygons to fill.
+
+# Last updated: 2026-10-17
+
+# Import libraries
+from time import perf_counter_ns
+from threading import Thread
+from queue import Queue, Empty
+from math import floor, hypot
+from bisect import bisect_left, bisect_right
+from array import array
+from graph import Graph, IncrementalRegions
+from latency import LatencyRecorder
+
+# Stages of add_line that are recorded in StainedGlassEngine.latency
+STAGES = ("intersect", "edges", "regions", "dedup")
+
+class Point:
+    # One record per vertex, shared by every line the vertex is on.
+    # __slots__ keeps each record small, a long session has tens of
+    # thousands of them
+    __slots__ = ("ind", "coord", "lines", "next")
+
+    def __init__(self, coord, ind):
+        self.ind = ind
+        self.coord = coord
+        self.lines = () # indices of the lines the point is on (a tuple, to keep the record small)
+        self.next = [] # next point along each of those lines in the graph (or None)
+
+class LineGrid:
+    # Uniform grid laid over the canvas to cut down on intersection tests.
+    # Every stored line is registered in each cell its segment passes
+    # through, so a new line only needs exact hasIntersect tests against
+    # the lines that share at least one cell with it.
+    def __init__(self, cellSize=64):
+        self.cellSize = cellSize
+        self.cells = {} # {(col, row) : [line0, line1, ...]}
+        self.tested = 0 # total number of exact tests handed out
+        self.skipped = 0 # total number of stored lines skipped without a test
+        self.lastTested, self.lastSkipped = 0, 0 # counts for the most recent query
+
+    # return every (col, row) cell that the line segment passes through.
+    # Bounds are padded slightly so an intersection sitting on a cell border
+    # is always found in a cell shared by both lines
+    def cellsFor(self, line):
+        pad = 1e-3
+        s = self.cellSize
+        (x1, y1), (x2, y2) = sorted(line)
+        cells = []
+        for col in range(floor((x1 - pad) / s), floor((x2 + pad) / s) + 1):
+            # clip the segment to the x range of this column
+            lo, hi = max(x1, col * s), min(x2, (col + 1) * s)
+            if x1 == x2:
+                ya, yb = y1, y2
+            else:
+                ya = y1 + (y2 - y1) * (lo - x1) / (x2 - x1)
+                yb = y1 + (y2 - y1) * (hi - x1) / (x2 - x1)
+            for row in range(floor((min(ya, yb) - pad) / s), floor((max(ya, yb) + pad) / s) + 1):
+                cells.append((col, row))
+        return cells
+
+    # add a line to every cell it passes through
+    def insert(self, lineNum, line):
+        for cell in self.cellsFor(line):
+            self.cells.setdefault(cell, []).append(lineNum)
+
+    # return the indices of all stored lines that share a cell with line,
+    # in ascending order so points are numbered exactly as in a full scan.
+    # numLines is the number of stored lines and is only used for the counts
+    def candidates(self, line, numLines):
+        found = set()
+        for cell in self.cellsFor(line):
+            found.update(self.cells.get(cell, ()))
+        self.lastTested, self.lastSkipped = len(found), numLines - len(found)
+        self.tested += self.lastTested
+        self.skipped += self.lastSkipped
+        return sorted(found)
+
+class VertexIndex:
+    # Hashed grid over the intersection points, used to snap a new
+    # intersection onto an existing vertex that is less than eps away.
+    # Without it, three strokes meeting at nearly the same spot give three
+    # vertices a hair apart, which show up as sliver faces and extra wedges.
+    def __init__(self, eps=0.5):
+        self.eps = eps
+        # {cell : Point} or {cell : [Point, ...]} once a cell holds more than one.
+        # Almost every cell holds a single vertex, so it is stored on its own
+        self.cells = {}
+        self.merged = 0 # number of intersections snapped onto an existing vertex
+
+    # cells are numbered col * 2**20 + row, an int key is much smaller than
+    # a (col, row) tuple. Rows stay well inside +-2**19 on any screen
+    def cellFor(self, coord):
+        return floor(coord[0] / self.eps) * 1048576 + floor(coord[1] / self.eps)
+
+    def add(self, point):
+        if self.eps <= 0: return
+        cell = self.cellFor(point.coord)
+        other = self.cells.get(cell)
+        if other is None: self.cells[cell] = point
+        elif isinstance(other, list): other.append(point)
+        else: self.cells[cell] = [other, point]
+
+    # return the closest stored Point within eps of coord, or None.
+    # Only the 3x3 block of cells around coord can hold one
+    def find(self, coord):
+        if self.eps <= 0: return None
+        cell = self.cellFor(coord)
+        best, bestDist = None, self.eps * self.eps
+        for c in (cell - 1048576, cell, cell + 1048576):
+            for key in (c - 1, c, c + 1):
+                points = self.cells.get(key)
+                if points is None: continue
+                if not isinstance(points, list): points = (points,)
+                for point in points:
+                    other = point.coord
+                    dist = (other[0] - coord[0]) ** 2 + (other[1] - coord[1]) ** 2
+                    if dist <= bestDist:
+                        best, bestDist = point, dist
+        if best is not None: self.merged += 1
+        return best
+
+class LineRegistry:
+    # Hash of the stored lines, used to reject a stroke that repeats an
+    # existing line without comparing it against every stored line. Exact
+    # repeats are found in a set of endpoint pairs. Near repeats (both ends
+    # within eps of the ends of a stored line) are found by rounding the
+    # endpoints to a grid of size eps and looking in the neighboring cells.
+    def __init__(self, eps=2):
+        self.eps = eps
+        self.exact = set() # {((x1, y1), (x2, y2)), ...}
+        self.cells = {} # {(cell1, cell2) : [line0, line1, ...]}
+        self.exactRejected = 0 # number of exact repeats rejected
+        self.nearRejected = 0 # number of near repeats rejected
+
+    def cellFor(self, p):
+        return (floor(p[0] / self.eps), floor(p[1] / self.eps))
+
+    def add(self, line):
+        self.exact.add(tuple(line))
+        if self.eps > 0:
+            self.cells.setdefault((self.cellFor(line[0]), self.cellFor(line[1])), []).append(line)
+
+    # True if line (with sorted endpoints) repeats a stored line. Rejections
+    # are counted in exactRejected and nearRejected
+    def isDuplicate(self, line):
+        if tuple(line) in self.exact:
+            self.exactRejected += 1
+            return True
+        if self.eps <= 0: return False
+        eps2 = self.eps * self.eps
+        close = lambda p, q: (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 <= eps2
+        # ends that are almost level can come out of the sort in either order
+        for first, second in ((line[0], line[1]), (line[1], line[0])):
+            (c1, r1), (c2, r2) = self.cellFor(first), self.cellFor(second)
+            for a in [(c1 + i, r1 + j) for i in (-1, 0, 1) for j in (-1, 0, 1)]:
+                for b in [(c2 + i, r2 + j) for i in (-1, 0, 1) for j in (-1, 0, 1)]:
+                    for other in self.cells.get((a, b), ()):
+                        if close(first, other[0]) and close(second, other[1]):
+                            self.nearRejected += 1
+                            return True
+        return False
+
+class PolygonIndex:
+    # Index over the vertex sets of the filled polygons. Polygons are stored
+    # by their frozenset of vertices, and every vertex keeps the set of
+    # polygons it belongs to, so questions about a polygon only look at the
+    # polygons that share a vertex with it instead of every stored polygon.
+    def __init__(self):
+        self.keys = {} # {frozenset(vertices) : polygon}
+        self.byVertex = {} # {(x, y) : {frozenset(vertices), ...}}
+
+    def add(self, polygon):
+        key = frozenset(polygon)
+        self.keys[key] = polygon
+        for v in key:
+            self.byVertex.setdefault(v, set()).add(key)
+
+    # True if a stored polygon has exactly the same vertices as polygon
+    def hasSame(self, polygon):
+        return frozenset(polygon) in self.keys
+
+    # True if a stored polygon has the same vertices as polygon, or its
+    # vertices are a subset or a superset of the vertices of polygon
+    def hasSubsetOrSuperset(self, polygon):
+        key = frozenset(polygon)
+        if key in self.keys: return True
+        seen = set()
+        for v in key:
+            for other in self.byVertex.get(v, ()):
+                if other in seen: continue
+                seen.add(other)
+                if other <= key or other >= key: return True
+        return False
+
+class StainedGlassEngine:
+    # All the geometry of the canvas, with no drawing. Lines go in through
+    # add_line, and the engine keeps the intersection points, the planar
+    # graph they form and its faces up to date. The faces that get filled
+    # (polygons, as tuples of (x, y) coords starting at the top-left-most
+    # vertex) are handed back so Paint, or any script, can draw them.
+    def __init__(self, mergeDistance=0.5, duplicateDistance=2, checkRegions=False, latency=None):
+        self.checkRegions = checkRegions # check the incremental regions against a full Graph.solve() (slow)
+
+        self.currLineIndex = 0 # increment after every line drawn
+        self.currPointIndex = 0 # increment after every point of intersection is found
+
+        # Stores all lines by their index
+        # {line0 : [(x1, y1), (x2, y2)], ...}
+        self.lines = {}
+
+        # Spatial index over all stored lines, used to skip intersection
+        # tests against lines that are nowhere near a new line
+        self.lineGrid = LineGrid()
+
+        # Hash of all stored lines, used to reject repeated strokes
+        self.lineRegistry = LineRegistry(duplicateDistance)
+
+        # Keeps the faces (regions) of the graph up to date as edges change
+        self.regionEngine = IncrementalRegions()
+
+        # Point indices that are not involved in a cycle (the only point on a line)
+        self.toExclude = set()
+
+        # Stores all points of intersection, indexed by point index (0-n).
+        # Each Point also keeps the lines it is on and, for each of them, the
+        # next point along that line in our directed graph, so the graph
+        # needs no storage of its own (see buildGraph)
+        self.points = []
+
+        # Stores the points on each line
+        # {line0 : [P1, P2, ... ]} where P1, P2, etc. are Point objects defined in the Point class
+        # Points are ordered by their position along the line
+        self.intersects = {}
+
+        # Position of each point in self.intersects along its line, from 0 at
+        # the first endpoint to 1 at the second. Kept in the same order as
+        # self.intersects so new points can be inserted by bisection
+        # {line0 : array('d', [t1, t2, ... ])}
+        self.intersectParams = {}
+
+        # Snaps intersections that land on an existing vertex onto that vertex
+        self.vertexIndex = VertexIndex(mergeDistance)
+
+        # Stores all filled polygons and the point indices of their vertices
+        # {(p1, p2, ... pn) : [i1, i2, ... in], ...}
+        self.polygons = {}
+
+        # Vertex sets of everything in self.polygons, used by isFilled and
+        # overlapsFilled
+        self.polygonIndex = PolygonIndex()
+
+        # Every face of the graph, with its place in the order a full
+        # Graph.solve() would find it (see solveOrder), used by
+        # findNewPolygons to try new faces in the same order as before
+        # {region as a tuple : (order, face polygon)}
+        self.faceOrder = {}
+
+        # The filled polygon that shows on each face of the graph (the face
+        # itself if it was filled, otherwise the newest polygon that showed
+        # on the faces it was cut from), and the number of faces each filled
+        # polygon still shows on. A filled polygon that shows on no face any more is
+        # covered by newer polygons and is handed back as replaced
+        # {face polygon : filled polygon}, {filled polygon : n}
+        self.shownBy = {}
+        self.showing = {}
+
+        # Order the polygons were filled in, the newest is on top
+        # {filled polygon : n}
+        self.fillOrder = {}
+
+        # Outlines of faces that stopped being a region (a face that touches
+        # itself is not one), with the filled polygon that still shows there.
+        # They are looked at again when new faces turn up inside them
+        # {outline : filled polygon}
+        self.stranded = {}
+
+        # Edges changed by the most recent line, as (Point, Point) pairs
+        self.addedEdges, self.removedEdges = [], []
+
+        # Time spent in each stage of add_line (see STAGES), per line. Paint
+        # passes its own recorder so all its timings end up in one summary
+        self.latency = latency if latency is not None else LatencyRecorder()
+
+    # Add the line from p1 to p2. Returns (newPolygons, replacedPolygons):
+    # the polygons to fill, and the filled polygons that the line cut up so
+    # that every part of them is now covered by new polygons (drawing them
+    # is no longer needed). Returns None if the line repeats an existing
+    # line and was not added
+    def add_line(self, p1, p2):
+        # increase line length slightly
+        line = self.extendLine([p1, p2], 3)
+
+        # sort line endpoints
+        # if line (or one almost on top of it) is already drawn, don't do anything
+        line = sorted(line)
+        if self.lineRegistry.isDuplicate(line):
+            return None
+
+        # find intersects between new line and all existing lines
+        tic = perf_counter_ns()
+        self.findIntersects(line)
+        tic = self.latency.lap("intersect", tic)
+
+        # add new line to lines dict
+        self.lines[self.currLineIndex] = line
+        self.lineGrid.insert(self.currLineIndex, line)
+        self.lineRegistry.add(line)
+
+        # increment current line number
+        self.currLineIndex += 1
+
+        # update edges
+        self.updateEdges(self.currLineIndex - 1)
+        self.latency.lap("edges", tic)
+
+        # find all new polygons
+        return self.findNewPolygons()
+
+    # add_line, plus what a caller that does not read the engine itself
+    # needs: (result, the line as it was stored (extended and sorted) or
+    # None, (exact, near) duplicate strokes rejected so far)
+    def addLineSnapshot(self, p1, p2):
+        result = self.add_line(p1, p2)
+        storedLine = self.lines[self.currLineIndex - 1] if result is not None else None
+        return result, storedLine, (self.lineRegistry.exactRejected, self.lineRegistry.nearRejected)
+
+    # every filled polygon, in the order they were filled
+    def faces(self):
+        return list(self.polygons)
+
+    # the filled polygons that still show on part of the canvas, in the order
+    # they were filled (which is the order to draw them in)
+    def livePolygons(self):
+        return list(self.showing)
+
+    # the (x, y) coords of every vertex, indexed by point index
+    def vertices(self):
+        return [point.coord for point in self.points]
+
+    # function to extend line by a factor of d. 
+    # this is useful for intersection detection
+    def extendLine(self, line, d):
+        p1, p2 = line[0], line[1]
+        mag = ((p2[0]-p1[0])**2 + (p2[1]-p1[1])**2) ** (1/2) # magnitude
+        
+        if mag != 0:
+            # new coords
+            x1 = p1[0] - d * (p2[0]-p1[0]) / mag
+            y1 = p1[1] - d * (p2[1]-p1[1]) / mag
+            x2 = p2[0] + d * (p2[0]-p1[0]) / mag
+            y2 = p2[1] + d * (p2[1]-p1[1]) / mag
+        else:
+            # new coords
+            x1 = p1[0] - d * (p2[0]-p1[0])
+            y1 = p1[1] - d * (p2[1]-p1[1])
+            x2 = p2[0] + d * (p2[0]-p1[0])
+            y2 = p2[1] + d * (p2[1]-p1[1])
+        
+        return [(x1, y1), (x2, y2)]
+
+    # Return true if line segments AB and CD intersect.
+    # This will be used in the findIntersects method
+    def hasIntersect(self, A, B, C, D):
+        def ccw(A,B,C):
+            return (C[1]-A[1]) * (B[0]-A[0]) > (B[1]-A[1]) * (C[0]-A[0])
+        return ccw(A,C,D) != ccw(B,C,D) and ccw(A,B,C) != ccw(A,B,D)
+
+    # Every time a line segment is drawn, we will call this function on that line segment
+    # For each line that the new line intersects, we will append the intersect coord (x, y) to 
+    # the values (lists) of both lines in self.intersects
+    # Return all intersects between line and all stored lines as a list of 2D points
+    def findIntersects(self, line):
+        # helper function to find intersection between 2 lines
+        def getIntersect(line1, line2):
+
+            xdiff = (line1[0][0] - line1[1][0], line2[0][0] - line2[1][0])
+            ydiff = (line1[0][1] - line1[1][1], line2[0][1] - line2[1][1])
+
+            def det(a, b):
+                return a[0] * b[1] - a[1] * b[0]
+
+            div = det(xdiff, ydiff)
+            if div == 0:
+                return None
+
+            d = (det(*line1), det(*line2))
+            x = det(d, xdiff) / div
+            y = det(d, ydiff) / div
+            return (x, y)
+
+        # loop through all stored lines near line, check intersect between line and each line l2
+        for lineNum in self.lineGrid.candidates(line, len(self.lines)):
+            l2 = self.lines[lineNum]
+            if self.hasIntersect(line[0], line[1], l2[0], l2[1]) == False:
+                continue
+            p = getIntersect(line, l2)
+            if p is not None: # if line and l2 intersecting
+                # reuse the vertex if the intersect is (nearly) on top of an existing one
+                point = self.vertexIndex.find(p)
+                if point is None:
+                    point = Point(p, self.currPointIndex)
+                    self.currPointIndex += 1
+                    self.vertexIndex.add(point)
+                    self.points.append(point)
+
+                # add the intersecting lines to the point, and insert the point
+                # in place on each line it is new to
+                for l, coords in ((self.currLineIndex, line), (lineNum, l2)):
+                    if l not in point.lines:
+                        point.lines += (l,)
+                        point.next.append(None)
+                        self.insertIntersect(l, coords, point)
+
+    # position of point p along line, 0 at line[0] and 1 at line[1]
+    def lineParam(self, line, p):
+        dx, dy = line[1][0] - line[0][0], line[1][1] - line[0][1]
+        mag = dx * dx + dy * dy
+        if mag == 0: return 0
+        return ((p[0] - line[0][0]) * dx + (p[1] - line[0][1]) * dy) / mag
+
+    # insert a Point into the list of points on line lineNum, keeping the list
+    # ordered by position along the line. Points at the same position keep
+    # the order they were found in
+    def insertIntersect(self, lineNum, line, point):
+        t = self.lineParam(line, point.coord)
+        params = self.intersectParams.get(lineNum)
+        if params is None:
+            params = self.intersectParams[lineNum] = array('d')
+        i = bisect_right(params, t)
+        params.insert(i, t)
+        self.intersects.setdefault(lineNum, []).insert(i, point)
+
+    # Function to update the graph after a new line is drawn onto canvas.
+    # Only the new line and the lines it crosses change, so rather than
+    # rebuilding the graph we splice the new points into the affected edge
+    # chains. Edges that changed are kept in self.addedEdges and
+    # self.removedEdges as (Point, Point) pairs
+    def updateEdges(self, lineNum):
+        self.addedEdges, self.removedEdges = [], []
+        newPoints = self.intersects.get(lineNum, [])
+
+        # update the points that are not involved in a cycle (the only point on one of their lines)
+        toggled = []
+        if len(newPoints) == 1:
+            self.toExclude.add(newPoints[0].ind)
+        for p in newPoints:
+            for other in p.lines:
+                if other == lineNum: continue
+                points = self.intersects[other]
+                if len(points) == 1:
+                    self.toExclude.add(p.ind)
+                elif len(points) == 2:
+                    # the old point on this line used to be excluded, it may not be anymore
+                    q = points[0] if points[1] is p else points[1]
+                    if q.ind in self.toExclude and not any(len(self.intersects[l]) == 1 for l in q.lines):
+                        self.toExclude.discard(q.ind)
+                        toggled.append(q)
+
+        # link up the new line, then splice each new point into the line it crosses
+        self.relinkChain(lineNum, 0, len(newPoints) - 1)
+        for p in newPoints:
+            for other in p.lines:
+                if other == lineNum: continue
+                i = self.findPosition(other, p)
+                self.relinkChain(other, i - 1, i + 1)
+
+        # points that are no longer excluded get linked to their neighbors
+        for q in toggled:
+            for other in q.lines:
+                i = self.findPosition(other, q)
+                self.relinkChain(other, i - 1, i + 1)
+
+    # recompute the edges between consecutive points on a line, from
+    # position first up to position last
+    def relinkChain(self, lineNum, first, last):
+        points = self.intersects.get(lineNum, [])
+        for i in range(max(first, 0), min(last, len(points) - 1)):
+            u, v = points[i], points[i+1]
+            k = u.lines.index(lineNum)
+            old = u.next[k]
+            if (u.ind not in self.toExclude) and (v.ind not in self.toExclude):
+                if old is not v:
+                    if old is not None: self.removedEdges.append((u, old))
+                    u.next[k] = v
+                    self.addedEdges.append((u, v))
+            elif old is not None:
+                self.removedEdges.append((u, old))
+                u.next[k] = None
+
+    # binary search for the position of Point point in the ordered list of
+    # points on line lineNum
+    def findPosition(self, lineNum, point):
+        points = self.intersects[lineNum]
+        t = self.lineParam(self.lines[lineNum], point.coord)
+        l = bisect_left(self.intersectParams[lineNum], t)
+        # step over any other points sitting at exactly the same position
+        while points[l] is not point: l += 1
+        return l
+
+    # build the directed graph as an adjacency list {Point : [Point, ...]}
+    # from the next point of every point along each of its lines
+    def buildGraph(self):
+        graph = {}
+        for u in self.points:
+            edges = [v for v in u.next if v is not None]
+            if edges: graph[u] = edges
+        return graph
+
+    # convert a region (list of point indices) to a polygon: a tuple of
+    # position coords starting at the top-left-most vertex
+    def regionToPolygon(self, region):
+        # convert point index to position coords
+        polygon = [self.points[p].coord for p in region] 
+
+        # reorder polygon vertices while preserving edge relationships
+        # we want the top-left-most vertex as the first item
+        forwardList = polygon + polygon
+        left = forwardList.index(min(polygon))
+        if forwardList[left][0] > forwardList[left + 1][0]:
+            forwardList.reverse() 
+            left = forwardList.index(min(polygon))
+        return tuple(forwardList[left:left+len(polygon)])
+
+    # Graph.buildRegions starts each region at the first unused wedge in
+    # sorted order, so regions come out of solve() sorted by their smallest
+    # directed edge (point index pairs)
+    def solveOrder(self, region):
+        return min((region[i-1], region[i]) for i in range(len(region)))
+
+    # function to find all new polygons since last line added. Returns
+    # (newPolygons, replacedPolygons), see add_line
+    def findNewPolygons(self):
+        def printPolygon(p, end='\n'):
+            coordsToPoints = {point.coord : point.ind for point in self.points}
+            for point in p:
+                print(coordsToPoints[point], end=' ')
+            print(end=end)
+
+        # only the faces touched by the new line are re-traced. regions are
+        # lists of point indices (0 - n)
+        tic = perf_counter_ns()
+        newRegions, removedRegions = self.regionEngine.update(self.addedEdges, self.removedEdges)
+        tic = self.latency.lap("regions", tic)
+
+        graph = self.buildGraph() if self.checkRegions else {}
+        if len(graph) > 1:
+            full = sorted(Graph(graph).solve())
+            assert full == sorted(self.regionEngine.regions()), "incremental regions differ from Graph.solve()"
+
+        removedFaces = []
+        for r in removedRegions:
+            removedFaces.append(self.faceOrder.pop(tuple(r))[1])
+
+        # no new regions means there are no new polygons
+        if not newRegions:
+            replacedPolygons = self.updateShown([], [], removedFaces)
+            self.latency.lap("dedup", tic)
+            return [], replacedPolygons
+
+        regionOf = {} # {polygon : region}
+
+        # for each polygon
+        for r in newRegions:
+            polygon = self.regionToPolygon(r)
+            regionOf[polygon] = r
+            self.faceOrder[tuple(r)] = (self.solveOrder(r), polygon)
+
+        # Which of two overlapping new faces gets filled depends on which is
+        # tried first. Try them in the order the full solve() did: the order
+        # of a set of every face, built in solve() order, minus the filled
+        # polygons. Faces from earlier lines come up again there, but they
+        # were turned down then and still are, so only new faces are tried
+        polygons = set(polygon for _, polygon in sorted(self.faceOrder.values()))
+        newPolygons = []
+        
+        # if polygon is new
+        for polygon in polygons - set(self.polygons):
+            if polygon not in regionOf: continue
+
+            # if polygon is already in stored polygons, don't add it again
+            isNew = not self.overlapsFilled(polygon)
+            
+            # if new polygon, add its vertices to the polygons dict
+            if isNew:
+                self.polygons[polygon] = regionOf[polygon] # add new polygon to list
+                self.polygonIndex.add(polygon)
+                newPolygons.append(polygon)
+        
+        # print("polygons:")
+        # for p in self.polygons:
+        #     printPolygon(p, end=' | ')
+
+        # an outer face that is not filled is no area of its own (it is the
+        # faces inside it, or the canvas around them), so it never takes
+        # over the polygon of a face it was cut from
+        filled = set(newPolygons)
+        faces = [polygon for polygon, r in regionOf.items() if polygon in filled or not self.isOuterFace(r)]
+        replacedPolygons = self.updateShown(faces, newPolygons, removedFaces)
+        self.latency.lap("dedup", tic)
+        return newPolygons, replacedPolygons
+
+    # update which filled polygon shows on each face after a line replaced
+    # removedFaces with newFaces, of which newPolygons were filled. Returns
+    # the filled polygons that no longer show on any face, see add_line.
+    # Faces are the outlines of regions, and two outlines are either nested
+    # (an island inside a face) or apart, so the outermost new faces inside
+    # a removed face cover it exactly, unless part of it is no region any
+    # more. Then its polygon stays on its outline (see self.stranded) until
+    # new faces inside it do cover it
+    def updateShown(self, newFaces, newPolygons, removedFaces):
+        filled = set(newPolygons)
+        for face in newPolygons:
+            self.fillOrder[face] = len(self.fillOrder)
+            self.shownBy[face] = face
+            self.showing[face] = 1
+
+        areas = {face: self.polygonArea(face) for face in newFaces}
+        points = {face: self.interiorPoint(face) for face in newFaces} if removedFaces or self.stranded else {}
+        located = [(x, y, areas[face], face) for face, (x, y) in points.items()]
+        strandedFaces = [face for face in self.stranded
+                         if any(self.containsPoint(face, point) for point in points.values())]
+        inherit = {} # {unfilled new face : latest polygon that showed around it}
+        released = []
+        for face in removedFaces + strandedFaces:
+            shown = self.shownBy.pop(face, None) if face in self.shownBy else self.stranded.pop(face, None)
+            if shown is None: continue
+            self.showing[shown] -= 1
+            released.append(shown)
+
+            # a vertex snapped onto one nearby (see VertexIndex) moves the
+            # outline by up to eps, so the faces cut from a face may cover a
+            # little more or less than it did
+            area = self.polygonArea(face)
+            slack = 1e-6 * max(area, 1) + self.vertexIndex.eps * self.polygonPerimeter(face)
+            left, right = min(v[0] for v in face), max(v[0] for v in face)
+            top, bottom = min(v[1] for v in face), max(v[1] for v in face)
+            inside = [new for x, y, a, new in located if left <= x <= right and top <= y <= bottom
+                      and a <= area + slack and self.containsPoint(face, (x, y))]
+            outermost = [new for new in inside if not any(areas[other] > areas[new]
+                         and self.containsPoint(other, points[new]) for other in inside)]
+            if abs(sum(areas[new] for new in outermost) - area) > slack:
+                self.stranded[face] = shown # still shows where there is no region
+                self.showing[shown] += 1
+                continue
+            for new in outermost:
+                if new in filled: continue
+                if new not in inherit or self.fillOrder[shown] > self.fillOrder[inherit[new]]:
+                    inherit[new] = shown
+
+        for new, shown in inherit.items():
+            self.shownBy[new] = shown
+            self.showing[shown] += 1
+
+        replacedPolygons = []
+        for shown in released:
+            if self.showing.get(shown) == 0:
+                del self.showing[shown]
+                replacedPolygons.append(shown)
+        return replacedPolygons
+
+    # area of a polygon, given as (x, y) coords in order
+    def polygonArea(self, polygon):
+        return abs(self.signedArea(polygon))
+
+    # length of the outline of a polygon
+    def polygonPerimeter(self, polygon):
+        x0, y0 = polygon[-1]
+        length = 0.0
+        for x1, y1 in polygon:
+            length += hypot(x1 - x0, y1 - y0)
+            x0, y0 = x1, y1
+        return length
+
+    # area of a polygon, positive if its vertices go clockwise on the
+    # screen (y pointing down)
+    def signedArea(self, polygon):
+        area = 0.0
+        x0, y0 = polygon[-1]
+        for x1, y1 in polygon:
+            area += x0 * y1 - x1 * y0
+            x0, y0 = x1, y1
+        return area / 2
+
+    # True if region (point indices, in the order it was traced) is the
+    # outline of a connected piece of the graph traced around its outside.
+    # Every face is traced with its inside on the same side, so an outside
+    # outline goes round the other way
+    def isOuterFace(self, region):
+        return self.signedArea([self.points[p].coord for p in region]) > 0
+
+    # a point strictly inside a simple polygon. The left-most vertex v is
+    # convex; the middle of the triangle it makes with its neighbors is
+    # inside the polygon unless another vertex is in that triangle, in which
+    # case the middle of v and the vertex nearest to v is
+    def interiorPoint(self, polygon):
+        def cross(o, p, q):
+            return (p[0]-o[0])*(q[1]-o[1]) - (p[1]-o[1])*(q[0]-o[0])
+
+        n = len(polygon)
+        i = polygon.index(min(polygon))
+        a, v, b = polygon[i-1], polygon[i], polygon[(i+1) % n]
+        turn = cross(a, v, b)
+        nearest, depth = None, 0
+        for j in range(n):
+            q = polygon[j]
+            if j in (i, (i-1) % n, (i+1) % n) or q in (a, v, b): continue
+            # q is in the triangle if it is on the same side of all three edges
+            if cross(a, v, q) * turn >= 0 and cross(v, b, q) * turn >= 0 and cross(b, a, q) * turn >= 0:
+                d = abs(cross(a, b, q)) # distance from ab, scaled
+                if nearest is None or d > depth:
+                    nearest, depth = q, d
+        if nearest is None:
+            return ((a[0]+v[0]+b[0]) / 3, (a[1]+v[1]+b[1]) / 3)
+        return ((v[0]+nearest[0]) / 2, (v[1]+nearest[1]) / 2)
+
+    # True if point is inside polygon (even-odd rule)
+    def containsPoint(self, polygon, point):
+        x, y = point
+        inside = False
+        x0, y0 = polygon[-1]
+        for x1, y1 in polygon:
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+            x0, y0 = x1, y1
+        return inside
+
+    # True if a filled polygon has exactly the vertices of polygon, given as
+    # a list of (x, y) position coords
+    def isFilled(self, polygon):
+        return self.polygonIndex.hasSame(polygon)
+
+    # True if a filled polygon has the same vertices as polygon, or a subset
+    # or superset of them. Such a polygon is not filled again
+    def overlapsFilled(self, polygon):
+        return self.polygonIndex.hasSubsetOrSuperset(polygon)
+
+class GeometryWorker:
+    # Owns a StainedGlassEngine on a background thread, so the geometry of a
+    # stroke does not hold up the Tk main loop. Lines are added in the order
+    # they are submitted and their results come back in the same order.
+    # While lines are in flight the engine must only be read after wait()
+    def __init__(self, engine):
+        self.engine = engine
+        self.lines = Queue() # lines waiting to be added (None stops the thread)
+        self.results = Queue() # addLineSnapshot of each line, in order
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                self.lines.task_done()
+                return
+            try:
+                self.results.put(self.engine.addLineSnapshot(line[0], line[1]))
+            except Exception as e: # handed to the main thread, see ready()
+                self.results.put(e)
+            self.lines.task_done()
+
+    def submit(self, line):
+        self.lines.put(line)
+
+    # all results that are ready, oldest first. An error raised by the
+    # engine is raised again here
+    def ready(self):
+        results = []
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except Empty:
+                return results
+            if isinstance(result, Exception):
+                raise result
+            results.append(result)
+
+    # block until every submitted line has been added
+    def wait(self):
+        self.lines.join()
+
+    def stop(self):
+        self.lines.put(None)
@@ -0,0 +1,255 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Benchmark suite for the drawing pipeline. Feeds synthetic stroke workloads
+# (random chords, dense grids, star/fan patterns, near-parallel hatching, and
+# strokes replayed from session .csv files) to a fresh StainedGlassEngine at
+# each size, and reports the per-stroke latency of every stage of drawLine
+# (intersect, edges, regions, dedup and, when a display is available,
+# render), the share of stored lines the line grid skipped without an exact
+# intersection test, and the peak Python heap. Results are saved as JSON, and a saved
+# result can be compared against the current tree with --compare.
+
+# A run that takes longer than --budget seconds is stopped where it is and
+# marked as truncated, and the larger sizes of that workload are skipped.
+# Dense workloads (chords, grid) grow with the square of the line count and
+# will not reach 5000 lines in any sensible budget.
+
+# Usage: python benchmark_geometry.py [--sizes 100 500 1000 5000] [--workloads chords grid ...]
+#                                     [--sessions SESSION.csv ...] [--budget 60] [--out FILE.json]
+#                                     [--compare OLD.json] [--no-memory]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import json
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime
+from math import cos, sin, pi
+from os import path
+from random import Random
+from time import perf_counter
+
+import stained_glass_engine
+from session_replay import loadStrokes, percentile
+from stained_glass_engine import StainedGlassEngine
+
+WIDTH, HEIGHT = 1024, 768 # canvas size of the operant boxes
+STAGES = stained_glass_engine.STAGES + ("render",)
+
+# random point on the edge of the canvas
+def edgePoint(rand):
+    u = rand.random()
+    return [(u * WIDTH, 0), (WIDTH, u * HEIGHT), (u * WIDTH, HEIGHT), (0, u * HEIGHT)][rand.randrange(4)]
+
+# lines between two random points on the edge of the canvas
+def chords(n, rand):
+    return [[edgePoint(rand), edgePoint(rand)] for _ in range(n)]
+
+# n/2 horizontal and n/2 vertical lines, evenly spaced across the canvas and
+# drawn alternately
+def grid(n, rand):
+    rows, cols = (n + 1) // 2, n // 2
+    horizontal = [[(0, HEIGHT * (i + 0.5) / rows), (WIDTH, HEIGHT * (i + 0.5) / rows)] for i in range(rows)]
+    vertical = [[(WIDTH * (i + 0.5) / cols, 0), (WIDTH * (i + 0.5) / cols, HEIGHT)] for i in range(cols)]
+    rand.shuffle(horizontal)
+    rand.shuffle(vertical)
+    lines = []
+    for i in range(rows):
+        lines.append(horizontal[i])
+        if i < cols: lines.append(vertical[i])
+    return lines
+
+# lines through one of five hubs at random angles, so many lines cross at
+# (almost) the same point
+def starFan(n, rand):
+    hubs = [(WIDTH / 2, HEIGHT / 2), (WIDTH / 4, HEIGHT / 4), (3 * WIDTH / 4, HEIGHT / 4),
+            (WIDTH / 4, 3 * HEIGHT / 4), (3 * WIDTH / 4, 3 * HEIGHT / 4)]
+    lines = []
+    for _ in range(n):
+        x, y = rand.choice(hubs)
+        angle = rand.uniform(0, pi)
+        r1, r2 = rand.uniform(50, 400), rand.uniform(50, 400)
+        lines.append([(x - r1 * cos(angle), y - r1 * sin(angle)), (x + r2 * cos(angle), y + r2 * sin(angle))])
+    return lines
+
+# long strokes within half a degree of the same direction, at random offsets
+def hatching(n, rand):
+    lines = []
+    for _ in range(n):
+        angle = pi / 6 + rand.uniform(-0.5, 0.5) * pi / 180
+        x, y = rand.uniform(0, WIDTH), rand.uniform(0, HEIGHT)
+        r = rand.uniform(100, 600)
+        lines.append([(x - r * cos(angle), y - r * sin(angle)), (x + r * cos(angle), y + r * sin(angle))])
+    return lines
+
+WORKLOADS = {"chords": chords, "grid": grid, "star": starFan, "hatching": hatching}
+
+# Render the way Paint.applyLine does: delete the replaced polygons, fill
+# each new polygon, draw the new line and keep the lines above the fills.
+# Returns None if there is no display to draw on
+def makeRenderer():
+    try:
+        from tkinter import Tk, Canvas
+        root = Tk()
+    except Exception: # no tkinter, or no display
+        return None
+    root.withdraw()
+    canvas = Canvas(root, width=WIDTH, height=HEIGHT)
+    ids = {}
+
+    def render(engine, newPolygons, replacedPolygons):
+        for polygon in replacedPolygons:
+            canvas.delete(ids.pop(polygon))
+        for polygon in newPolygons:
+            ids[polygon] = canvas.create_polygon(polygon, fill="#808080", outline="#808080", width=0.5)
+        canvas.create_line(engine.lines[engine.currLineIndex - 1], width=0.5, tags="line")
+        if newPolygons:
+            canvas.tag_raise("line")
+
+    def reset():
+        canvas.delete("all")
+        ids.clear()
+        root.update_idletasks()
+
+    render.reset = reset
+    render.close = root.destroy
+    return render
+
+# summary in milliseconds of the per-stroke times of a stage
+def summarize(times):
+    times = sorted(times)
+    return {"total_ms": sum(times) * 1000,
+            "mean_ms": sum(times) / len(times) * 1000 if times else 0,
+            "p50_ms": percentile(times, 50) * 1000,
+            "p95_ms": percentile(times, 95) * 1000,
+            "max_ms": (times[-1] if times else 0) * 1000}
+
+# add strokes to a fresh engine and time each stage of every stroke
+def timeRun(strokes, budget, render):
+    engine = StainedGlassEngine()
+    perStroke = {stage: [] for stage in STAGES}
+    duplicates, truncated = 0, False
+    start = perf_counter()
+    for line in strokes:
+        result = engine.add_line(line[0], line[1])
+        if result is None:
+            duplicates += 1
+            continue
+        for stage in stained_glass_engine.STAGES:
+            perStroke[stage].append(engine.latency.last(stage) / 1e9)
+        if render is not None:
+            tic = perf_counter()
+            render(engine, *result)
+            perStroke["render"].append(perf_counter() - tic)
+        if perf_counter() - start > budget:
+            truncated = True
+            break
+    elapsed = perf_counter() - start
+    if render is not None: render.reset()
+    added = engine.currLineIndex
+    return {"lines": added + duplicates,
+            "added": added,
+            "duplicates": duplicates,
+            "truncated": truncated,
+            "vertices": len(engine.points),
+            "faces": len(engine.regionEngine.regions()),
+            "polygons": len(engine.polygons),
+            "showing": len(engine.showing),
+            "tested": engine.lineGrid.tested, # exact intersection tests made
+            "skipped": engine.lineGrid.skipped, # stored lines the grid ruled out without a test
+            "total_s": elapsed,
+            "ms_per_line": elapsed / max(added, 1) * 1000,
+            "stages": {stage: summarize(times) if times else None for stage, times in perStroke.items()}}
+
+# peak Python heap, in MB, while adding the strokes to a fresh engine
+def peakMemory(strokes):
+    tracemalloc.start()
+    engine = StainedGlassEngine()
+    for line in strokes:
+        engine.add_line(line[0], line[1])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+# short description of the tree being benchmarked
+def version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=path.dirname(path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+def runSuite(args):
+    workloads = {name: WORKLOADS[name] for name in args.workloads if name in WORKLOADS}
+    if args.sessions:
+        replayed = [line for csvPath in args.sessions for line in loadStrokes(csvPath)]
+        workloads["replay"] = lambda n, rand: replayed[:n]
+
+    render = None if args.no_render else makeRenderer()
+    if render is None and not args.no_render:
+        print("no display, render stage not measured")
+
+    results = {"version": version(), "date": datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(), "budget_s": args.budget, "workloads": {}}
+    print(f"{'workload':<10}{'lines':>7}{'added':>7}{'vertices':>10}{'ms/line':>10}"
+          + "".join(f"{stage + ' p95':>15}" for stage in STAGES) + f"{'skipped %':>11}{'peak MB':>10}")
+    for name, make in workloads.items():
+        results["workloads"][name] = runs = {}
+        for n in args.sizes:
+            strokes = make(n, Random(args.seed))
+            if len(strokes) < n:
+                print(f"{name:<10}{n:>7}  only {len(strokes)} strokes available, skipped")
+                continue
+            run = timeRun(strokes, args.budget, render)
+            pairs = run["tested"] + run["skipped"]
+            if not args.no_memory:
+                run["peak_mb"] = peakMemory(strokes[:run["lines"]])
+            runs[str(n)] = run
+            print(f"{name:<10}{run['lines']:>7}{run['added']:>7}{run['vertices']:>10}{run['ms_per_line']:>10.2f}"
+                  + "".join(f"{run['stages'][s]['p95_ms'] if run['stages'][s] else float('nan'):>15.3f}" for s in STAGES)
+                  + f"{run['skipped'] / pairs * 100 if pairs else float('nan'):>11.1f}"
+                  + f"{run.get('peak_mb', float('nan')):>10.1f}" + ("  (truncated)" if run["truncated"] else ""))
+            if run["truncated"]:
+                break
+    if render is not None: render.close()
+    return results
+
+# print how the ms per line and peak memory of each run changed since old
+def compare(old, new):
+    print(f"\ncompared with {old.get('version') or 'old run'} ({old.get('date', '')})")
+    print(f"{'workload':<10}{'lines':>7}{'ms/line old/new':>22}{'change':>9}{'peak MB old/new':>22}")
+    for name, runs in new["workloads"].items():
+        for n, run in runs.items():
+            before = old.get("workloads", {}).get(name, {}).get(n)
+            if before is None or before["lines"] != run["lines"]:
+                continue
+            change = (run["ms_per_line"] / before["ms_per_line"] - 1) * 100 if before["ms_per_line"] else 0
+            memory = f"{before.get('peak_mb', float('nan')):.1f}/{run.get('peak_mb', float('nan')):.1f}"
+            print(f"{name:<10}{n:>7}{before['ms_per_line']:>11.2f}/{run['ms_per_line']:<10.2f}{change:>+8.1f}%{memory:>22}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stroke geometry on synthetic workloads")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 5000], help="lines per run")
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS), help=f"any of {', '.join(WORKLOADS)}")
+    parser.add_argument("--sessions", nargs="*", default=[], help="per-peck data .csv files to replay")
+    parser.add_argument("--budget", type=float, default=60, help="seconds per run before it is truncated")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="benchmark_geometry.json", help="where to save the results")
+    parser.add_argument("--compare", help="results of an earlier run to compare against")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory runs")
+    parser.add_argument("--no-render", action="store_true", help="skip the render stage")
+    args = parser.parse_args()
+
+    results = runSuite(args)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=1)
+    print(f"\nresults saved to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main()
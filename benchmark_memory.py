@@ -0,0 +1,85 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Memory benchmark for the geometry kept between strokes. Adds short random
+# strokes (about the length of a pigeon's stroke) to a StainedGlassEngine
+# and reports the bytes used per line as the session grows: the whole Python
+# heap (measured with tracemalloc) and a breakdown by structure. Canvas items
+# live inside Tk and are not counted.
+
+# Usage: python benchmark_memory.py [--lines 5000] [--step 500] [--seed 0]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import sys
+import tracemalloc
+from random import Random
+
+import stained_glass_engine
+from stained_glass_engine import StainedGlassEngine
+
+# Engine attributes counted in each group. Objects shared between groups
+# are counted in the first one
+VERTEX_ATTRS = ["points", "intersects", "intersectParams", "vertexIndex", "toExclude"]
+GROUPS = [("vertices", VERTEX_ATTRS),
+          ("lines", ["lines", "lineGrid", "lineRegistry"]),
+          ("faces", ["regionEngine"]),
+          ("polygons", ["polygons", "polygonIndex"])]
+
+# size in bytes of obj and everything it holds that is not in seen yet
+def deepSize(obj, seen):
+    total, stack = 0, [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen: continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif type(o).__module__ == stained_glass_engine.__name__:
+            if hasattr(o, "__dict__"): stack.append(o.__dict__)
+            stack.extend(getattr(o, s) for s in getattr(type(o), "__slots__", ()) if hasattr(o, s))
+    return total
+
+# random strokes between 20 and 150 pixels long
+def shortStrokes(n, seed=0):
+    rand = Random(seed)
+    strokes = []
+    for _ in range(n):
+        x, y = rand.uniform(0, 1024), rand.uniform(0, 768)
+        dx, dy = rand.uniform(-1, 1), rand.uniform(-1, 1)
+        length = rand.uniform(20, 150) / max((dx * dx + dy * dy) ** 0.5, 1e-9)
+        strokes.append([(x, y), (x + dx * length, y + dy * length)])
+    return strokes
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bytes per line of the stroke geometry")
+    parser.add_argument("--lines", type=int, default=5000, help="number of strokes to draw")
+    parser.add_argument("--step", type=int, default=500, help="report every this many strokes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    engine = StainedGlassEngine()
+    start = tracemalloc.get_traced_memory()[0]
+
+    print("bytes per line (bytes per vertex for the vertex store)")
+    print(f"{'lines':>7}{'vertices':>10}{'heap':>10}" + "".join(f"{name:>10}" for name, _ in GROUPS) + f"{'B/vertex':>10}")
+    for i, line in enumerate(shortStrokes(args.lines, args.seed), 1):
+        engine.add_line(line[0], line[1])
+        if i % args.step == 0 or i == args.lines:
+            used = tracemalloc.get_traced_memory()[0] - start
+            vertices = engine.currPointIndex
+            seen, sizes = set(), []
+            for name, attrs in GROUPS:
+                sizes.append(sum(deepSize(getattr(engine, a), seen) for a in attrs))
+            print(f"{i:>7}{vertices:>10}{used / i:>10.0f}" + "".join(f"{s / i:>10.0f}" for s in sizes)
+                  + f"{sizes[0] / max(vertices, 1):>10.0f}")
+    tracemalloc.stop()
+
+if __name__ == "__main__":
+    main()
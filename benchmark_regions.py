@@ -0,0 +1,170 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Benchmark for the region step of Graph.solve(). Compares the original
+# buildRegions (linear findUnused scan + binary search for every wedge)
+# against the worklist mode (one pass over the sorted wedges + O(1)
+# successor map) on graphs with thousands of wedges, and checks that both
+# find the same regions. Then checks that StainedGlassEngine, which keeps
+# the regions up to date line by line, fills the same polygons as the
+# paint program did with a full solve() after every line (with vertex
+# merging and duplicate-line rejection off, which it did not have), and
+# that on 150-line sessions every filled polygon still on the canvas shows
+# on a face (none is left covered up).
+
+# Usage: python benchmark_regions.py [--max-wedges N] [--parity-runs N] [--session-runs N]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import sys
+from os import path
+from random import Random
+from time import perf_counter
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), "ArtBlocks_ArtProgram_2025-09-30"))
+from graph import Graph
+from stained_glass_engine import StainedGlassEngine
+
+class Point:
+    def __init__(self, coord, ind):
+        self.ind = ind
+        self.coord = coord
+
+# n x n lattice of slightly jittered points, each joined to its right and
+# lower neighbor. Every inner face is a quadrilateral.
+def latticeGraph(n, seed=0):
+    rand = Random(seed)
+    points = [[Point((40*i + rand.uniform(-5, 5), 40*j + rand.uniform(-5, 5)), i*n + j)
+               for j in range(n)] for i in range(n)]
+    graph = {}
+    for i in range(n):
+        for j in range(n):
+            if i + 1 < n: graph.setdefault(points[i][j], []).append(points[i+1][j])
+            if j + 1 < n: graph.setdefault(points[i][j], []).append(points[i][j+1])
+    return graph
+
+# n random chords on a 1024x768 canvas, split at every crossing the same way
+# the paint program builds its graph (consecutive points along each line)
+def chordGraph(n, seed=0):
+    rand = Random(seed)
+    lines = [[(rand.uniform(0, 1024), rand.uniform(0, 768)),
+              (rand.uniform(0, 1024), rand.uniform(0, 768))] for _ in range(n)]
+    onLine = {i: [] for i in range(n)} # {line : [(t, Point), ...]}
+    ind = 0
+    for a in range(n):
+        (x1, y1), (x2, y2) = lines[a]
+        for b in range(a):
+            (x3, y3), (x4, y4) = lines[b]
+            div = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+            if div == 0: continue
+            t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / div
+            u = ((x1 - x3) * (y1 - y2) - (y1 - y3) * (x1 - x2)) / div
+            if 0 < t < 1 and 0 < u < 1:
+                p = (x1 + t * (x2 - x1), y1 + t * (y2 - y1))
+                onLine[a].append((t, Point(p, ind)))
+                onLine[b].append((u, Point(p, ind)))
+                ind += 1
+    graph = {}
+    for points in onLine.values():
+        points.sort(key=lambda x: x[0])
+        if len(points) < 2: continue
+        for k in range(len(points) - 1):
+            graph.setdefault(points[k][1], []).append(points[k+1][1])
+    return graph
+
+# time only the region tracing step, the angle and wedge steps are shared
+def timeRegions(graph, worklist):
+    g = Graph(graph)
+    g.buildVertexAngles()
+    g.buildWedges()
+    tic = perf_counter()
+    if worklist:
+        g.buildRegionsWorklist()
+    else:
+        g.buildRegions()
+    return perf_counter() - tic, len(g.wedges), g.regions
+
+# random strokes inside the canvas border, as the paint program draws them
+def strokes(n, seed):
+    rand = Random(seed)
+    border = [[(-1, -1), (1025, -1)], [(1025, -1), (1025, 769)], [(1025, 769), (-1, 769)], [(-1, 769), (-1, -1)]]
+    return border + [[(rand.randint(0, 1024), rand.randint(0, 768)), (rand.randint(0, 1024), rand.randint(0, 768))]
+                     for _ in range(n)]
+
+# Add lines to engine and return the polygons the paint program filled
+# before the incremental regions: after every line, every face of a full
+# solve() that is not filled yet is tried, in the order of the set they are
+# in, against everything filled before it
+def baselineFills(engine, lines):
+    filled = []
+    for p1, p2 in lines:
+        engine.add_line(p1, p2)
+        graph = engine.buildGraph()
+        if len(graph) <= 1: continue
+        polygons = set(engine.regionToPolygon(r) for r in Graph(graph).solve())
+        for polygon in list(polygons - set(filled)):
+            polygonSet = set(polygon)
+            if all(set(curr) - polygonSet and polygonSet - set(curr) for curr in filled):
+                filled.append(polygon)
+    return filled
+
+# Add lines to engine, keeping the filled polygons Paint would have on the
+# canvas (filled and not replaced since), and check they are exactly the
+# polygons showing on a face, or on what is left of a face that stopped
+# being a region. An outer face only ever shows its own fill
+def checkShown(engine, lines):
+    live = set()
+    for p1, p2 in lines:
+        result = engine.add_line(p1, p2)
+        if result is None: continue
+        newPolygons, replacedPolygons = result
+        live.difference_update(replacedPolygons)
+        live.update(newPolygons)
+    visible = set(engine.shownBy.values()) | set(engine.stranded.values())
+    for r in engine.regionEngine.regions():
+        face = engine.regionToPolygon(r)
+        assert not engine.isOuterFace(r) or engine.shownBy.get(face, face) == face, "an outer face shows a polygon"
+    return len(live), len(visible), len(engine.shownBy)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Graph.solve() region tracing")
+    parser.add_argument("--max-wedges", type=int, default=20000,
+                        help="skip graphs with more wedges than this (the original tracer is quadratic)")
+    parser.add_argument("--parity-runs", type=int, default=60,
+                        help="random stroke sequences to compare fills on (default: %(default)s)")
+    parser.add_argument("--session-runs", type=int, default=10,
+                        help="random 150-line sessions to count canvas items on (default: %(default)s)")
+    args = parser.parse_args()
+
+    workloads = [("lattice", n, latticeGraph(n)) for n in (10, 20, 30, 45, 60)]
+    workloads += [("chords", n, chordGraph(n)) for n in (30, 60, 90, 120)]
+
+    print(f"{'graph':<10}{'n':>5}{'wedges':>9}{'regions':>9}{'original (s)':>15}{'worklist (s)':>15}{'speedup':>10}")
+    for name, n, graph in workloads:
+        fast, wedges, fastRegions = timeRegions(graph, True)
+        if wedges > args.max_wedges:
+            print(f"{name:<10}{n:>5}{wedges:>9}{len(fastRegions):>9}{'skipped':>15}{fast:>15.4f}{'':>10}")
+            continue
+        slow, _, slowRegions = timeRegions(graph, False)
+        assert sorted(slowRegions) == sorted(fastRegions), f"regions differ on {name} {n}"
+        print(f"{name:<10}{n:>5}{wedges:>9}{len(fastRegions):>9}{slow:>15.4f}{fast:>15.4f}{slow / fast:>9.1f}x")
+
+    tic = perf_counter()
+    for seed in range(args.parity_runs):
+        engine = StainedGlassEngine(mergeDistance=0, duplicateDistance=0)
+        filled = baselineFills(engine, strokes(20, seed))
+        assert sorted(engine.faces()) == sorted(filled), f"fills differ from a full solve() on stroke sequence {seed}"
+    print(f"fills match a full solve() on {args.parity_runs} stroke sequences ({perf_counter() - tic:.2f} s)")
+
+    tic = perf_counter()
+    items = faces = 0
+    for seed in range(args.session_runs):
+        live, visible, shownFaces = checkShown(StainedGlassEngine(), strokes(150, seed))
+        assert live == visible, f"{live} polygons on the canvas but {visible} show on session {seed}"
+        items, faces = items + live, faces + shownFaces
+    print(f"canvas items equal the polygons showing on {args.session_runs} sessions: "
+          f"{items} items for {faces} filled faces ({perf_counter() - tic:.2f} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Counts the Tk canvas calls that Paint makes per stroke. Paint is run with
+# a stand-in Canvas that only counts the calls made on it, so no display is
+# needed, and the count is reported per stroke (averaged over each window of
+# strokes) for every canvas method. Between the two pecks of a stroke the
+# mouse moves --moves times, two moves per display frame, which is where
+# the guideline is drawn. Point --program at the copy of
+# noahs_art_program.py or RUN_ME.py from another version (for example a git
+# worktree) to compare before and after.
+
+# Usage: python benchmark_tk_calls.py [--program noahs_art_program.py] [--lines 500] [--moves 20]
+#                                     [--sessions SESSION.csv ...] [--seed 0]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import importlib
+import sys
+from collections import Counter
+from os import path
+from types import SimpleNamespace
+
+CHECKPOINTS = (50, 100, 250, 500, 1000, 2000, 5000)
+
+class CountingCanvas:
+    # Stands in for tkinter.Canvas. Every method call is counted, item
+    # creating calls return a new id
+    def __init__(self, *args, **kwargs):
+        self.calls = Counter()
+        self.lastId = 0
+
+    def pack(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls[name] += 1
+            if name.startswith("create_"):
+                self.lastId += 1
+                return self.lastId
+        return call
+
+class StubRoot:
+    # Stands in for the Tk root. Callbacks given to after() run when run()
+    # is called
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, func=None, *args):
+        if func is not None: self.callbacks.append((func, args))
+
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for func, args in callbacks:
+            func(*args)
+
+    def __getattr__(self, name): # bind, geometry, attributes, ...
+        return lambda *args, **kwargs: None
+
+# import the paint program at programPath with CountingCanvas in place of Canvas
+def loadProgram(programPath):
+    folder, name = path.split(path.abspath(programPath))
+    sys.path.insert(0, folder)
+    module = importlib.import_module(path.splitext(name)[0])
+    module.Canvas = CountingCanvas
+    return module
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the Tk canvas calls Paint makes per stroke")
+    parser.add_argument("--program", default=path.join(path.dirname(path.abspath(__file__)), "noahs_art_program.py"),
+                        help="noahs_art_program.py or RUN_ME.py to measure")
+    parser.add_argument("--lines", type=int, default=500, help="number of strokes to draw")
+    parser.add_argument("--sessions", nargs="*", default=[], help="per-peck data .csv files to replay instead of random strokes")
+    parser.add_argument("--moves", type=int, default=20, help="mouse moves between the two pecks of a stroke")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # loaded after the program, so an older version of the program gets the
+    # engine next to it
+    program = loadProgram(args.program)
+    from session_replay import loadStrokes
+    from benchmark_memory import shortStrokes
+    if args.sessions:
+        strokes = [line for csvPath in args.sessions for line in loadStrokes(csvPath)][:args.lines]
+    else:
+        strokes = shortStrokes(args.lines, args.seed)
+
+    root = StubRoot()
+    paint = program.Paint(root, "TEST") if program.Paint.__init__.__code__.co_argcount > 2 else program.Paint(root)
+    canvas = paint.canvas
+    canvas.calls.clear() # leave out the setup of the canvas
+
+    print(f"Tk canvas calls per stroke, {args.program}")
+    windows, previous, done = [], Counter(), 0
+    for i, line in enumerate(strokes, 1):
+        # a stroke is two pecks, as onLeftButton gets them, with the mouse
+        # moving towards the second one in between
+        (x1, y1), (x2, y2) = line
+        paint.onLeftButton(SimpleNamespace(x=x1, y=y1))
+        for k in range(1, args.moves + 1):
+            paint.onMouseMove(SimpleNamespace(x=x1 + (x2 - x1) * k / args.moves, y=y1 + (y2 - y1) * k / args.moves))
+            if k % 2 == 0: root.run() # a display frame
+        paint.onLeftButton(SimpleNamespace(x=x2, y=y2))
+        root.run()
+        if hasattr(paint, "finishStrokes"): paint.finishStrokes()
+        if i in CHECKPOINTS or i == len(strokes):
+            windows.append((done + 1, i, canvas.calls - previous))
+            previous, done = Counter(canvas.calls), i
+
+    methods = sorted(canvas.calls, key=lambda name: -canvas.calls[name])
+    print(f"{'strokes':>12}{'total':>8}" + "".join(f"{name:>16}" for name in methods))
+    for first, last, calls in windows:
+        n = last - first + 1
+        print(f"{f'{first}-{last}':>12}{sum(calls.values()) / n:>8.1f}" + "".join(f"{calls[name] / n:>16.1f}" for name in methods))
+    if hasattr(paint, "worker") and paint.worker is not None: paint.worker.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Batch gallery of the saved canvases. Walks the folders the programs save
+# canvases to and, for every canvas, makes what is missing: a .png of each
+# .eps (drawn by Ghostscript at EPS_SCALE, as the programs did before they
+# exported .png straight from the polygons), and a thumbnail
+# (<name>_thumb.png, as exportPng writes) of every .png. The conversions run
+# on a pool of processes, one per core. Each folder gets a manifest
+# (gallery_manifest.csv) of the canvases done, with the SHA-1 of their
+# source file, so the next run only converts canvases that are new or
+# whose file changed (a file whose size and modification time are the same
+# is not even read), and a static index.html with the thumbnails, newest
+# first, linking to the full .png images.
+
+# Usage: python build_gallery.py [SAVE_DIR ...] [--workers N] [--scale 2]
+#        (default: saved_art and the operant box save folders that exist)
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import hashlib
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+from csv import reader, writer
+from datetime import datetime
+from time import perf_counter_ns
+from urllib.parse import quote
+
+from PIL import Image
+
+DEFAULT_DIRS = ["saved_art", "~/Desktop/Data/Pigeon_Art", "~/Desktop/Data/P033c_HUMAN_data/saved_canvases"]
+EPS_SCALE = 2 # .eps files are drawn this many times the size of the canvas, like EXPORT_SCALE
+THUMBNAIL_SIZE = (256, 192) # largest size of the thumbnails, like THUMBNAIL_SIZE in the programs
+MANIFEST = "gallery_manifest.csv"
+MANIFEST_HEADERS = ["Source", "Size", "MTimeNs", "SHA1", "Png", "Thumbnail", "Error"]
+
+def fileHash(filePath):
+    digest = hashlib.sha1()
+    with open(filePath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# The canvases of a folder, as {name : source file}. The source of a canvas
+# is its .png, unless it only has an .eps or its .png was made from the .eps
+# by an earlier run (manifest: {name : row})
+def findCanvases(saveDir, manifest):
+    files = set(os.listdir(saveDir))
+    canvases = {}
+    for fileName in files:
+        name, extension = os.path.splitext(fileName)
+        if extension == ".eps" or (extension == ".png" and not name.endswith("_thumb")):
+            canvases.setdefault(name, set()).add(extension)
+    sources = {}
+    for name, extensions in canvases.items():
+        fromEps = ".eps" in extensions and (".png" not in extensions or manifest.get(name, [""])[0].endswith(".eps"))
+        sources[name] = os.path.join(saveDir, name + (".eps" if fromEps else ".png"))
+    return sources
+
+# Make the .png (of an .eps) and the thumbnail of one canvas. Run on the
+# pool. Returns the manifest row; a canvas that could not be converted has
+# the error in it and is tried again next time
+def convert(name, source, digest, scale, thumbnailSize):
+    saveDir = os.path.dirname(source)
+    pngPath = os.path.join(saveDir, name + ".png")
+    thumbPath = os.path.join(saveDir, name + "_thumb.png")
+    stat = os.stat(source)
+    row = [source, stat.st_size, stat.st_mtime_ns, digest or fileHash(source), pngPath, thumbPath, ""]
+    try:
+        image = Image.open(source)
+        if source.endswith(".eps"):
+            image.load(scale=scale) # needs Ghostscript
+            image = image.convert("RGB")
+            image.save(pngPath, compress_level=1)
+        image.thumbnail(thumbnailSize)
+        image.save(thumbPath)
+    except (OSError, ValueError) as e:
+        row[-1] = str(e) or type(e).__name__
+    return row
+
+def readManifest(saveDir):
+    manifestPath = os.path.join(saveDir, MANIFEST)
+    if not os.path.exists(manifestPath): return {}
+    with open(manifestPath, newline='') as f:
+        rows = list(reader(f))
+    if not rows or rows[0] != MANIFEST_HEADERS: return {}
+    return {os.path.splitext(os.path.basename(row[0]))[0]: row for row in rows[1:]}
+
+def writeManifest(saveDir, manifest):
+    manifestPath = os.path.join(saveDir, MANIFEST)
+    with open(manifestPath + ".tmp", 'w', newline='') as f:
+        w = writer(f)
+        w.writerow(MANIFEST_HEADERS)
+        w.writerows(manifest[name] for name in sorted(manifest))
+    os.replace(manifestPath + ".tmp", manifestPath)
+
+# Whether a canvas has to be converted: (True/False, SHA-1 of its source if
+# it had to be read to tell)
+def needsWork(source, entry):
+    if entry is None or entry[0] != source or entry[-1]:
+        return True, None
+    if not (os.path.exists(entry[4]) and os.path.exists(entry[5])):
+        return True, None
+    stat = os.stat(source)
+    if entry[1:3] == [str(stat.st_size), str(stat.st_mtime_ns)]:
+        return False, None
+    digest = fileHash(source) # touched: see if the contents changed
+    if digest != entry[3]:
+        return True, digest
+    entry[1:3] = [stat.st_size, stat.st_mtime_ns]
+    return False, digest
+
+# index.html of a folder: the thumbnails of its canvases, newest first
+def writeIndex(saveDir, manifest):
+    done = [row for row in manifest.values() if not row[-1]]
+    done.sort(key=lambda row: os.path.getmtime(row[4]) if os.path.exists(row[4]) else 0, reverse=True)
+    items = []
+    for row in done:
+        png, thumb = os.path.basename(row[4]), os.path.basename(row[5])
+        saved = datetime.fromtimestamp(os.path.getmtime(row[4])).strftime("%Y-%m-%d %H:%M") if os.path.exists(row[4]) else ""
+        items.append(f'<figure><a href="{quote(png)}"><img src="{quote(thumb)}" loading="lazy" alt=""></a>'
+                     f'<figcaption>{html.escape(png.split("_")[0])}<br>{saved}</figcaption></figure>')
+    with open(os.path.join(saveDir, "index.html"), "w") as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Stained Glass Gallery</title>\n"
+                "<style>body{background:#111;color:#ddd;font-family:sans-serif} "
+                "figure{display:inline-block;margin:8px;text-align:center} img{border:1px solid #444}</style>\n"
+                f"</head><body><h1>Stained Glass Gallery ({len(done)} canvases)</h1>\n"
+                + "\n".join(items) + "\n</body></html>\n")
+
+def buildGallery(saveDirs, scale=EPS_SCALE, thumbnailSize=THUMBNAIL_SIZE, workers=None):
+    jobs, manifests = [], {}
+    for saveDir in saveDirs:
+        manifest = manifests[saveDir] = readManifest(saveDir)
+        sources = findCanvases(saveDir, manifest)
+        for name in list(manifest):
+            if name not in sources: del manifest[name] # deleted canvases
+        for name, source in sources.items():
+            thumbPath = os.path.join(saveDir, name + "_thumb.png")
+            if name not in manifest and source.endswith(".png") and os.path.exists(thumbPath) \
+                    and os.path.getmtime(thumbPath) >= os.path.getmtime(source):
+                # exported with its thumbnail by the program: nothing to do
+                stat = os.stat(source)
+                manifest[name] = [source, stat.st_size, stat.st_mtime_ns, fileHash(source), source, thumbPath, ""]
+                continue
+            work, digest = needsWork(source, manifest.get(name))
+            if work: jobs.append((saveDir, name, source, digest))
+    if jobs:
+        with ProcessPoolExecutor(workers) as pool:
+            rows = pool.map(convert, [name for _, name, _, _ in jobs], [source for _, _, source, _ in jobs],
+                            [digest for _, _, _, digest in jobs], [scale] * len(jobs), [thumbnailSize] * len(jobs))
+            for (saveDir, name, _, _), row in zip(jobs, rows):
+                manifests[saveDir][name] = row
+                if row[-1]: print(f"- {row[0]} not converted: {row[-1]}")
+    for saveDir, manifest in manifests.items():
+        writeManifest(saveDir, manifest)
+        writeIndex(saveDir, manifest)
+    return sum(len(manifest) for manifest in manifests.values()), len(jobs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert saved canvases to .png with thumbnails and write an index.html")
+    parser.add_argument("dirs", nargs="*", help="save folders (default: those of " + ", ".join(DEFAULT_DIRS) + " that exist)")
+    parser.add_argument("--workers", type=int, help="processes converting (default: one per core)")
+    parser.add_argument("--scale", type=int, default=EPS_SCALE, help=".eps files are drawn this many times larger (default: %(default)s)")
+    args = parser.parse_args()
+
+    saveDirs = args.dirs or [d for d in map(os.path.expanduser, DEFAULT_DIRS) if os.path.isdir(d)]
+    tic = perf_counter_ns()
+    total, converted = buildGallery(saveDirs, args.scale, THUMBNAIL_SIZE, args.workers)
+    print(f"{total} canvases in {len(saveDirs)} folder(s), {converted} converted, in {(perf_counter_ns() - tic) / 1e9:.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Where on the 1024x768 screen the birds peck, across sessions. Every
+# session's pecks (X1, Y1) are binned into a 2D histogram once and cached,
+# then the histograms of the sessions asked for (by subject, box,
+# experiment and date, from the session index, see session_index.py) are
+# added up, one heatmap per group. Each heatmap is written as the raw counts
+# (.npy, rows are y, columns are x) and as a .png overlay: a see-through
+# heat map the size of the screen, which can be put over a saved canvas.
+
+# Pecks are read from the session's .events file if it has one (memory
+# mapped, see session_events.py), otherwise from the X1 and Y1 columns of
+# the .csv by NumPy, so no rows are turned into Python objects. A cached
+# histogram is only made again if its session file changes, so adding a
+# session only bins that file. Needs NumPy.
+
+# Usage: python peck_heatmap.py [DATA_DIR ...] [--index FILE] [--out-dir DIR] [--bin 8]
+#                               [--by subject|box|experiment|all] [--subject NAME ...]
+#                               [--box N ...] [--experiment NAME ...] [--from DATE] [--to DATE]
+#                               [--background IMAGE]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import hashlib
+import os
+from time import perf_counter_ns
+
+import numpy as np
+from PIL import Image
+
+import session_index
+from session_events import loadEvents, NA
+
+WIDTH, HEIGHT = 1024, 768 # the screen the pecks are on
+DEFAULT_CACHE = "P033c_heatmap_cache"
+DEFAULT_OUT = "P033c_heatmaps"
+GROUP_COLUMNS = {"subject": "Subject", "box": "BoxNumber", "experiment": "Experiment"}
+
+# the x, y of every peck of a session, as two NumPy arrays
+def loadPecks(csvPath):
+    eventsPath = os.path.splitext(csvPath)[0] + ".events"
+    if os.path.exists(eventsPath) and os.path.getmtime(eventsPath) >= os.path.getmtime(csvPath):
+        _, events = loadEvents(eventsPath)
+        pecks = events[(events["Event"] == 0) & (events["X1"] != NA)]
+        return pecks["X1"], pecks["Y1"]
+    with open(csvPath, newline='') as f:
+        headers = f.readline().strip().split(",")
+    if "X1" not in headers or "Y1" not in headers:
+        return np.zeros(0), np.zeros(0)
+    xy = np.genfromtxt(csvPath, delimiter=",", skip_header=1, usecols=(headers.index("X1"), headers.index("Y1")),
+                       missing_values="NA", filling_values=np.nan, ndmin=2)
+    xy = xy[~np.isnan(xy).any(axis=1)] # the SessionEnds row has no peck
+    return xy[:, 0], xy[:, 1]
+
+# The histogram of one session's pecks, in bins of binSize pixels, as
+# (flat bin index, count) pairs of the bins that have pecks: a session
+# pecks a few hundred places, so this is much smaller than the whole grid.
+# Pecks off the screen are left out
+def binSession(csvPath, binSize):
+    x, y = loadPecks(csvPath)
+    onScreen = (x >= 0) & (x < WIDTH) & (y >= 0) & (y < HEIGHT)
+    columns = WIDTH // binSize
+    cells = (y[onScreen] // binSize).astype(np.int64) * columns + (x[onScreen] // binSize).astype(np.int64)
+    cells, counts = np.unique(cells, return_counts=True)
+    return np.stack([cells, counts]).astype(np.int32)
+
+# The cached histogram of a session (see binSession), made if it is not
+# cached yet. The cache file is named after the path, size and modification
+# time of the session file, so a changed file gets a new one
+def cachedSession(cacheDir, csvPath, size, mtime, binSize):
+    key = hashlib.sha1(f"{csvPath}|{size}|{mtime}".encode()).hexdigest()[:20]
+    cachePath = os.path.join(cacheDir, key + ".npy")
+    if os.path.exists(cachePath):
+        return cachePath, np.load(cachePath)
+    sparse = binSession(csvPath, binSize)
+    np.save(cachePath, sparse)
+    return cachePath, sparse
+
+# Add up the histograms of sessions ({path : index row}) into one 2D array
+def heatmap(cacheDir, sessions, binSize, used):
+    cells, counts = [], []
+    for csvPath, row in sessions.items():
+        try:
+            cachePath, sparse = cachedSession(cacheDir, csvPath, row[1], row[2], binSize)
+        except (OSError, ValueError) as e:
+            print(f"- {csvPath} left out: {e}")
+            continue
+        used.add(os.path.basename(cachePath))
+        cells.append(sparse[0])
+        counts.append(sparse[1])
+    rows, columns = HEIGHT // binSize, WIDTH // binSize
+    if not cells: return np.zeros((rows, columns), np.int64)
+    total = np.bincount(np.concatenate(cells), weights=np.concatenate(counts), minlength=rows * columns)
+    return total.astype(np.int64).reshape(rows, columns)
+
+# A WIDTH x HEIGHT RGBA image of counts: clear where there are no pecks,
+# then from see-through red to opaque yellow-white at the most pecked bin
+# (on a square-root scale, so a few busy spots do not wash out the rest)
+def overlay(counts, background=None):
+    level = np.sqrt(counts / counts.max()) if counts.max() > 0 else np.zeros(counts.shape)
+    rgba = np.zeros(counts.shape + (4,), np.uint8)
+    rgba[..., 0] = 255
+    rgba[..., 1] = np.clip(level * 2 - 0.5, 0, 1) * 255
+    rgba[..., 2] = np.clip(level * 4 - 3, 0, 1) * 255
+    rgba[..., 3] = np.where(counts > 0, 64 + level * 191, 0)
+    image = Image.fromarray(rgba, "RGBA").resize((WIDTH, HEIGHT), Image.NEAREST)
+    if background is not None:
+        image = Image.alpha_composite(Image.open(background).convert("RGBA").resize((WIDTH, HEIGHT)), image)
+    return image
+
+# the index rows of the sessions asked for by args, grouped by args.by
+def selectSessions(index, args):
+    groups = {}
+    for csvPath, row in index.items():
+        values = dict(zip(session_index.INDEX_HEADERS, row))
+        day = values["StartTime"][:10]
+        if (args.subject and values["Subject"] not in args.subject
+                or args.box and values["BoxNumber"] not in args.box
+                or args.experiment and values["Experiment"] not in args.experiment
+                or args.date_from and not (day != "NA" and day >= args.date_from)
+                or args.date_to and not (day != "NA" and day <= args.date_to)):
+            continue
+        group = "all" if args.by == "all" else f"{args.by}-{values[GROUP_COLUMNS[args.by]]}"
+        groups.setdefault(group, {})[csvPath] = row
+    return groups
+
+def main():
+    parser = argparse.ArgumentParser(description="Peck heatmaps across sessions")
+    parser.add_argument("dirs", nargs="*", help="data folders (default: " + ", ".join(session_index.DEFAULT_DIRS) + ")")
+    parser.add_argument("--index", default=session_index.DEFAULT_INDEX, help="the session index .csv (default: %(default)s)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE, help="cached session histograms (default: %(default)s)")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT, help="where the heatmaps are written (default: %(default)s)")
+    parser.add_argument("--bin", type=int, default=8, help="bin size in pixels, a divisor of 1024 and 768 (default: %(default)s)")
+    parser.add_argument("--by", choices=["subject", "box", "experiment", "all"], default="subject", help="one heatmap per (default: %(default)s)")
+    parser.add_argument("--subject", nargs="+", help="only these subjects")
+    parser.add_argument("--box", nargs="+", help="only these boxes")
+    parser.add_argument("--experiment", nargs="+", help="only these experiments")
+    parser.add_argument("--from", dest="date_from", help="only sessions on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="only sessions on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--background", help="an image (e.g. a saved canvas) to draw the overlays on")
+    args = parser.parse_args()
+    if WIDTH % args.bin or HEIGHT % args.bin:
+        parser.error("--bin must divide 1024 and 768")
+
+    tic = perf_counter_ns()
+    dataDirs = args.dirs or [d for d in session_index.DEFAULT_DIRS if os.path.isdir(d)]
+    session_index.updateIndex(dataDirs, args.index)
+    index = session_index.readIndex(args.index)
+    cacheDir = os.path.join(args.cache_dir, f"bin{args.bin}")
+    os.makedirs(cacheDir, exist_ok=True)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    used = set()
+    for group, sessions in sorted(selectSessions(index, args).items()):
+        counts = heatmap(cacheDir, sessions, args.bin, used)
+        name = os.path.join(args.out_dir, "heatmap_" + "".join(c if c.isalnum() or c in "-_." else "_" for c in group))
+        np.save(name + ".npy", counts)
+        overlay(counts, args.background).save(name + ".png")
+        print(f"{group}: {len(sessions)} sessions, {counts.sum()} pecks -> {name}.png")
+
+    # drop the histograms of sessions that changed or are gone (only after
+    # a run over every session, so a filtered run does not empty the cache)
+    if not (args.subject or args.box or args.experiment or args.date_from or args.date_to):
+        for name in os.listdir(cacheDir):
+            if name not in used: os.remove(os.path.join(cacheDir, name))
+    print(f"{len(index)} sessions indexed, done in {(perf_counter_ns() - tic) / 1e9:.2f} s")
+
+if __name__ == "__main__":
+    main()
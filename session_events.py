@@ -0,0 +1,237 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Compact binary copy of a session's data .csv (<session>.events, written
+# next to it by SessionLog). The columns that are the same on every row
+# (StartTime, Subject, BoxNumber, ...) are stored once in a header, Date is
+# worked out from StartTime and SessionTime, and every row is one
+# fixed-width record of numbers:
+#     SessionTime, IRI            int64, microseconds
+#     X1 ... NNearDuplicateLines  int32, NA stored as -2**31
+#     Event                       int8, index into EVENTS
+#     BackgroundColor             int32, 0xRRGGBB
+# The file is b"P033EVT1", the length of the header (uint32), the header
+# (JSON) and then the records, little-endian. A record cut off by a crash at
+# the end of the file is ignored. Session files written before the duplicate
+# line counts have 21 columns; their records hold NA for the two counts, and
+# the header lists the columns the .csv had, so it comes back as it was.
+
+# loadEvents memory-maps the records straight into a NumPy array (NumPy is
+# only needed for that). readRows/toCsv give back the rows of the .csv
+# exactly as SessionLog wrote them, and fromCsv makes the .events of an
+# older .csv, checking that the .csv can be regenerated from it exactly.
+
+# Usage: python session_events.py to-csv SESSION.events [SESSION.events ...] [--out-dir DIR]
+#        python session_events.py from-csv SESSION.csv [SESSION.csv ...] [--out-dir DIR]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import json
+import os
+import re
+import struct
+from csv import reader, writer, QUOTE_MINIMAL
+from datetime import datetime, timedelta
+
+try:
+    import numpy as np # only for loadEvents
+except ImportError:
+    np = None
+
+MAGIC = b"P033EVT1"
+NA = -2**31
+EVENTS = ["peck", "SessionEnds"]
+ONE_US = timedelta(microseconds=1)
+
+# The columns stored in every record, in order, with their struct code
+RECORD_COLUMNS = [
+    ("SessionTime", "q"), ("IRI", "q"),
+    ("X1", "i"), ("Y1", "i"), ("PrevX", "i"), ("PrevY", "i"), ("SizeOfLine", "i"),
+    ("Event", "b"),
+    ("NPolygons", "i"), ("NDots", "i"), ("NLines", "i"),
+    ("BackgroundColor", "i"),
+    ("NExactDuplicateLines", "i"), ("NNearDuplicateLines", "i"),
+    ]
+# Record columns older session files do not have (stored as NA)
+OPTIONAL_COLUMNS = ["NExactDuplicateLines", "NNearDuplicateLines"]
+# The columns stored once, in the header
+CONSTANT_COLUMNS = ["NIslands", "NColors", "StartTime", "Experiment", "P033_Phase",
+                    "PrevReinforcersEarned", "BoxNumber", "Subject"]
+RECORD = struct.Struct("<" + "".join(code for _, code in RECORD_COLUMNS))
+
+# "1 day, 2:03:04.000005" (str of a timedelta) back into a timedelta
+TIMEDELTA = re.compile(r"(?:(-?\d+) days?, )?(\d+):(\d\d):(\d\d)(?:\.(\d{6}))?$")
+def parseTimedelta(text):
+    match = TIMEDELTA.match(text)
+    if match is None: raise ValueError(f"not a time: {text!r}")
+    days, hours, minutes, seconds, micro = match.groups()
+    return timedelta(days=int(days or 0), hours=int(hours), minutes=int(minutes),
+                     seconds=int(seconds), microseconds=int(micro or 0))
+
+# Each column of a record: value in a row of the .csv -> number in the
+# record, and back to the text in the .csv. The values may be the text read
+# from a .csv, or what formatRow returns (timedelta, int, ...). Values that
+# would not come back exactly raise ValueError
+def packTime(value):
+    if isinstance(value, str):
+        time = parseTimedelta(value)
+        if str(time) != value: raise ValueError(f"time not stored exactly: {value!r}")
+        value = time
+    return value // ONE_US
+
+def unpackTime(number):
+    return str(timedelta(microseconds=number))
+
+def packInt(value):
+    if value == "NA": return NA
+    number = int(value)
+    if str(number) != str(value) or not NA < number < 2**31: raise ValueError(f"not stored exactly: {value!r}")
+    return number
+
+def unpackInt(number):
+    return "NA" if number == NA else str(number)
+
+def packEvent(value):
+    return EVENTS.index(value)
+
+def unpackEvent(number):
+    return EVENTS[number]
+
+def packColor(value):
+    if value == "NA": return NA
+    number = int(value[1:], 16)
+    if '#%06X' % number != value: raise ValueError(f"color not stored exactly: {value!r}")
+    return number
+
+def unpackColor(number):
+    return "NA" if number == NA else '#%06X' % number
+
+CONVERTERS = {"SessionTime": (packTime, unpackTime), "IRI": (packTime, unpackTime),
+              "Event": (packEvent, unpackEvent), "BackgroundColor": (packColor, unpackColor)}
+
+class EventLog:
+    # Appends rows (lists of the values of headers, as written to the .csv)
+    # to eventsPath. The header is written with the first rows, which give
+    # the constant columns. headers may leave out OPTIONAL_COLUMNS
+    def __init__(self, eventsPath, headers):
+        columns = [c for c, _ in RECORD_COLUMNS] + CONSTANT_COLUMNS + ["Date"]
+        missing = [c for c in columns if c not in headers]
+        if sorted(headers) != sorted(c for c in columns if c not in missing) or not set(missing) <= set(OPTIONAL_COLUMNS):
+            raise ValueError("these columns cannot be stored in an .events file")
+        self.headers = list(headers)
+        self.recordIndex = [(headers.index(column) if column in headers else None,
+                             CONVERTERS.get(column, (packInt, unpackInt))[0])
+                            for column, _ in RECORD_COLUMNS]
+        self.constantIndex = [(headers.index(column), column) for column in CONSTANT_COLUMNS]
+        self.dateIndex = headers.index("Date")
+        self.sessionTimeIndex = headers.index("SessionTime")
+        self.constants = None
+        self.file = open(eventsPath, "wb")
+
+    # one row as a record, checking that the rest of the row can be
+    # regenerated from it and the header
+    def pack(self, row):
+        for i, column in self.constantIndex:
+            if str(row[i]) != self.constants[column]:
+                raise ValueError(f"{column} changed during the session: {row[i]!r}")
+        if str(row[self.dateIndex]) != str((self.startTime + packTime(row[self.sessionTimeIndex]) * ONE_US).date()):
+            raise ValueError(f"Date does not match StartTime + SessionTime: {row[self.dateIndex]!r}")
+        return RECORD.pack(*[pack(row[i]) if i is not None else NA for i, pack in self.recordIndex])
+
+    def write(self, rows):
+        if not rows: return
+        if self.constants is None:
+            self.constants = {column: str(rows[0][i]) for i, column in self.constantIndex}
+            self.startTime = datetime.fromisoformat(self.constants["StartTime"])
+            header = json.dumps({"headers": self.headers, "constants": self.constants}).encode()
+            self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.file.write(b"".join(map(self.pack, rows)))
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+# the header of an .events file and the offset of its first record
+def readHeader(f):
+    if f.read(len(MAGIC)) != MAGIC: raise ValueError("not an .events file")
+    size, = struct.unpack("<I", f.read(4))
+    return json.loads(f.read(size)), len(MAGIC) + 4 + size
+
+# the header of an .events file and its records as a NumPy structured
+# array, memory-mapped (nothing is read until it is used). SessionTime and
+# IRI are in microseconds; NA is -2**31, as are the columns the .csv did
+# not have (header["headers"] lists the ones it did)
+def loadEvents(eventsPath):
+    if np is None: raise RuntimeError("loadEvents needs NumPy (pip install numpy)")
+    with open(eventsPath, "rb") as f:
+        header, offset = readHeader(f)
+    count = (os.path.getsize(eventsPath) - offset) // RECORD.size
+    dtype = np.dtype([(column, "<" + code) for column, code in RECORD_COLUMNS])
+    if count == 0: return header, np.zeros(0, dtype)
+    return header, np.memmap(eventsPath, dtype, mode="r", offset=offset, shape=(count,))
+
+# the rows of the .csv (header row first) an .events file was written with
+def readRows(eventsPath):
+    with open(eventsPath, "rb") as f:
+        header, offset = readHeader(f)
+        data = f.read()
+    headers, constants = header["headers"], header["constants"]
+    startTime = datetime.fromisoformat(constants["StartTime"])
+    unpackers = [CONVERTERS.get(column, (packInt, unpackInt))[1] for column, _ in RECORD_COLUMNS]
+    columns = [column for column, _ in RECORD_COLUMNS]
+    rows = [headers]
+    for record in RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size]):
+        values = dict(constants)
+        values.update(zip(columns, [unpack(number) for unpack, number in zip(unpackers, record)]))
+        values["Date"] = str((startTime + record[0] * ONE_US).date())
+        rows.append([values[column] for column in headers])
+    return rows
+
+# write the .csv of an .events file
+def toCsv(eventsPath, csvPath):
+    rows = readRows(eventsPath)
+    with open(csvPath, "w", newline='') as f:
+        writer(f, quoting=QUOTE_MINIMAL).writerows(rows)
+    return len(rows) - 1
+
+# write the .events of a session .csv. Raises ValueError if the .csv could
+# not be regenerated from it exactly
+def fromCsv(csvPath, eventsPath):
+    with open(csvPath, newline='') as f:
+        rows = list(reader(f))
+    log = EventLog(eventsPath, rows[0])
+    try:
+        log.write(rows[1:])
+    finally:
+        log.close()
+    if readRows(eventsPath) != rows:
+        raise ValueError(f"{csvPath} cannot be regenerated exactly from its .events")
+    return len(rows) - 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert session data between .csv and .events")
+    parser.add_argument("command", choices=["to-csv", "from-csv"])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--out-dir", help="write the converted files here (default: next to each file)")
+    args = parser.parse_args()
+
+    convert, extension = (toCsv, ".csv") if args.command == "to-csv" else (fromCsv, ".events")
+    for filePath in args.files:
+        outPath = os.path.splitext(filePath)[0] + extension
+        if args.out_dir:
+            outPath = os.path.join(args.out_dir, os.path.basename(outPath))
+        if os.path.exists(outPath):
+            print(f"{filePath}: not converted ({outPath} exists)")
+            continue
+        try:
+            print(f"{filePath}: {convert(filePath, outPath)} rows -> {outPath}")
+        except ValueError as e:
+            print(f"{filePath}: not converted ({e})")
+            if os.path.exists(outPath): os.remove(outPath)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Incremental summary of every session in the data folders. Finds the
+# session data files (P033c_<subject>_<timestamp>_*.csv, not the _Latency
+# summaries) under the given folders, and keeps one row per session in an
+# index .csv: the path, size and modification time of the file, then the
+# subject, box, experiment, number of pecks, lines and polygons, duration
+# and IRI statistics of the session. When it is run again only the files
+# that are new or changed since the last run (by size and modification
+# time) are read, on a pool of processes, and files that are gone are
+# dropped, so keeping the index up to date after a session takes a moment
+# however many years of sessions there are.
+
+# Usage: python session_index.py [DATA_DIR ...] [--index FILE] [--workers N]
+#        (default: P033c_StainedGlass_Data and P033c_HUMAN_data, if they are
+#        in the current folder, into P033c_session_index.csv)
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from csv import reader, writer, Error as CsvError
+from time import perf_counter_ns
+
+from session_events import parseTimedelta
+
+DEFAULT_DIRS = ["P033c_StainedGlass_Data", "P033c_HUMAN_data"]
+DEFAULT_INDEX = "P033c_session_index.csv"
+SESSION_FILE = re.compile(r"P033c_.+_\d{4}-\d\d-\d\d_\d\d\.\d\d\.\d\d_.*\.csv$")
+POOL_MIN = 4 # fewer files than this are read in this process (starting the pool takes longer)
+
+FILE_HEADERS = ["Path", "Size", "MTimeNs"]
+SUMMARY_HEADERS = ["Subject", "BoxNumber", "Experiment", "P033_Phase", "StartTime",
+                   "NPecks", "NLines", "NPolygons", "DurationS",
+                   "IRIMeanS", "IRIMedianS", "IRIP95S", "IRIMaxS", "Error"]
+INDEX_HEADERS = FILE_HEADERS + SUMMARY_HEADERS
+
+# the session data files under dataDirs, as {path : (size, mtime in ns)}
+def findSessions(dataDirs):
+    sessions = {}
+    for dataDir in dataDirs:
+        for folder, _, files in os.walk(dataDir):
+            for name in files:
+                if SESSION_FILE.match(name) and not name.endswith("_Latency.csv"):
+                    filePath = os.path.join(folder, name)
+                    stat = os.stat(filePath)
+                    sessions[filePath] = (stat.st_size, stat.st_mtime_ns)
+    return sessions
+
+# SessionTime / IRI text in seconds (older files may hold plain numbers),
+# None if it is NA or unreadable
+def seconds(text):
+    try:
+        return parseTimedelta(text).total_seconds()
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+
+# the SUMMARY_HEADERS values of one session .csv. Columns a file does not
+# have (older versions wrote fewer) are NA. Run on the process pool
+def summarizeSession(csvPath):
+    try:
+        with open(csvPath, newline='') as f:
+            rows = reader(f)
+            column = {name: i for i, name in enumerate(next(rows, []))}
+            get = lambda row, name: row[column[name]] if name in column and column[name] < len(row) else "NA"
+            first = last = None
+            pecks = 0
+            iris = []
+            for row in rows:
+                if not row: continue
+                if first is None: first = row
+                last = row
+                if get(row, "Event") == "peck":
+                    if pecks:
+                        iri = seconds(get(row, "IRI"))
+                        if iri is not None: iris.append(iri)
+                    pecks += 1
+    except (OSError, UnicodeDecodeError, CsvError) as e:
+        return ["NA"] * (len(SUMMARY_HEADERS) - 1) + [str(e)]
+    if first is None:
+        return ["NA"] * (len(SUMMARY_HEADERS) - 1) + ["no data rows"]
+
+    duration = seconds(get(last, "SessionTime"))
+    if iris:
+        iris.sort()
+        iriStats = [round(sum(iris) / len(iris), 6), iris[len(iris) // 2],
+                    iris[min(len(iris) - 1, int(0.95 * len(iris)))], iris[-1]]
+    else:
+        iriStats = ["NA"] * 4
+    return ([get(first, name) for name in ["Subject", "BoxNumber", "Experiment", "P033_Phase", "StartTime"]]
+            + [pecks, get(last, "NLines"), get(last, "NPolygons"), duration if duration is not None else "NA"]
+            + iriStats + [""])
+
+# the rows of an index .csv, as {path : row}
+def readIndex(indexPath):
+    if not os.path.exists(indexPath): return {}
+    with open(indexPath, newline='') as f:
+        rows = list(reader(f))
+    if not rows or rows[0] != INDEX_HEADERS: return {} # another version of the index: start again
+    return {row[0]: row for row in rows[1:]}
+
+# write the index in place of the old one, never leaving it half written
+def writeIndex(indexPath, rows):
+    tmpPath = indexPath + ".tmp"
+    with open(tmpPath, 'w', newline='') as f:
+        w = writer(f)
+        w.writerow(INDEX_HEADERS)
+        w.writerows(rows)
+    os.replace(tmpPath, indexPath)
+
+# Bring the index at indexPath up to date with the sessions under dataDirs.
+# Returns (number of sessions, number read this time)
+def updateIndex(dataDirs, indexPath, workers=None):
+    sessions = findSessions(dataDirs)
+    index = readIndex(indexPath)
+    changed = [filePath for filePath, (size, mtime) in sessions.items()
+               if filePath not in index or index[filePath][1:3] != [str(size), str(mtime)]]
+    if len(changed) >= POOL_MIN:
+        with ProcessPoolExecutor(workers) as pool:
+            summaries = list(pool.map(summarizeSession, changed, chunksize=16))
+    else:
+        summaries = [summarizeSession(filePath) for filePath in changed]
+    for filePath, summary in zip(changed, summaries):
+        index[filePath] = [filePath, *sessions[filePath]] + summary
+    if changed or len(index) != len(sessions):
+        writeIndex(indexPath, [index[filePath] for filePath in sorted(sessions)])
+    return len(sessions), len(changed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the per-session summary index of the data folders")
+    parser.add_argument("dirs", nargs="*", help="data folders (default: " + ", ".join(DEFAULT_DIRS) + ")")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="the index .csv (default: %(default)s)")
+    parser.add_argument("--workers", type=int, help="processes reading the files (default: one per core)")
+    args = parser.parse_args()
+
+    dataDirs = args.dirs or [d for d in DEFAULT_DIRS if os.path.isdir(d)]
+    tic = perf_counter_ns()
+    total, read = updateIndex(dataDirs, args.index, args.workers)
+    print(f"{total} sessions in {args.index}, {read} read, in {(perf_counter_ns() - tic) / 1e9:.2f} s")
+
+if __name__ == "__main__":
+    main()
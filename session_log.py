@@ -0,0 +1,87 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Streaming session data. write_data only stores a small record of raw
+# numbers for every peck (perf_counter_ns timestamps, coordinates, counts);
+# a SessionLog turns the records into .csv rows on its own thread and
+# appends them to the session's data file every flushSeconds, or as soon as
+# flushRows are waiting. The file then holds the whole session up to the
+# last second or so if the box crashes or loses power, and the Tk thread
+# never formats a row or touches the disk. Given an eventsPath, the rows are
+# also written to a compact binary .events file (see session_events.py).
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import os
+from collections import deque
+from csv import writer, QUOTE_MINIMAL
+from threading import Thread, Event
+
+from session_events import EventLog
+
+class SessionLog:
+    # Writes headers to filePath straight away, then formatRow(record) for
+    # every record, in the order they were recorded
+    def __init__(self, filePath, headers, formatRow, flushSeconds=1, flushRows=100, eventsPath=None):
+        self.filePath = filePath
+        self.formatRow = formatRow
+        self.flushSeconds = flushSeconds
+        self.flushRows = flushRows
+        self.records = deque() # recorded but not written yet
+        self.wake = Event() # set when flushRows are waiting, or on close
+        self.closed = False
+        self.file = open(filePath, 'w', newline='')
+        self.writer = writer(self.file, quoting=QUOTE_MINIMAL)
+        self.writer.writerow(headers)
+        self.file.flush()
+        self.events = EventLog(eventsPath, headers) if eventsPath is not None else None
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # called for every peck: only stores the record
+    def record(self, record):
+        self.records.append(record)
+        if len(self.records) >= self.flushRows:
+            self.wake.set()
+
+    def run(self):
+        while True:
+            closing = self.closed # everything recorded before close() is written below
+            self.flush()
+            if closing:
+                break
+            self.wake.wait(self.flushSeconds)
+            self.wake.clear()
+        self.file.close()
+        if self.events is not None:
+            self.events.close()
+
+    # format and write the records waiting, and make sure they are on disk
+    def flush(self):
+        rows = []
+        while self.records:
+            rows.append(self.formatRow(self.records.popleft()))
+        if rows:
+            self.writer.writerows(rows)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            if self.events is not None:
+                self.writeEvents(rows)
+
+    # A row that cannot be stored exactly in the .events file stops it
+    # there; the .csv goes on as usual
+    def writeEvents(self, rows):
+        try:
+            self.events.write(rows)
+            self.events.flush()
+        except ValueError as e:
+            print(f"ERROR writing {self.events.file.name}, stopped: {e}")
+            self.events.close()
+            self.events = None
+
+    # write everything recorded so far and close the file. Blocks until done
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.wake.set()
+        self.thread.join()
@@ -0,0 +1,146 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Headless replay of saved sessions. Reads the per-peck data .csv files
+# written by write_comp_data (P033c_<subject>_*.csv), rebuilds the lines the
+# same way onLeftButton does (every second peck ends the line started by the
+# peck before it, and a peck left over at the end draws nothing), and adds
+# them to a StainedGlassEngine at full speed with no display, after the
+# border lines Paint draws when it opens. The final polygons are the ones
+# the session ended with.
+
+# For each session it prints the number of strokes, polygons filled,
+# polygons still showing (the canvas items Paint ends with) and vertices,
+# the per-stroke latency and a digest of the final polygon set. The digest
+# does not depend on the order the polygons were filled in, so two versions
+# of the geometry can be checked against each other. With --out-dir it also
+# writes the per-stroke timings (.csv) and the final polygons (.json), and
+# --expect checks the polygons against a .json written by an earlier run.
+
+# Usage: python session_replay.py SESSION.csv [SESSION.csv ...] [--out-dir DIR] [--expect DIR]
+#                                 [--distance 0.5] [--duplicate-distance 2]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+import hashlib
+import json
+import sys
+from csv import reader, writer
+from os import path, makedirs
+from time import perf_counter_ns
+
+import stained_glass_engine
+from stained_glass_engine import StainedGlassEngine
+
+TIMING_HEADERS = ["Stroke", "X1", "Y1", "X2", "Y2", "Added", "NNewPolygons", "NReplacedPolygons",
+                  "NVertices", "TotalMs"] + [stage.capitalize() + "Ms" for stage in stained_glass_engine.STAGES]
+
+# return the strokes of a session as a list of [(x1, y1), (x2, y2)] lines
+def loadStrokes(csvPath):
+    with open(csvPath, newline='') as csvfile:
+        rows = list(reader(csvfile))
+    header = rows[0]
+    x, y, event = header.index("X1"), header.index("Y1"), header.index("Event")
+    pecks = [(float(row[x]), float(row[y])) for row in rows[1:] if row[event] == "peck"]
+    return [[pecks[i], pecks[i+1]] for i in range(0, len(pecks) - 1, 2)]
+
+# the lines Paint draws just outside the canvas when it opens, which make
+# the whole canvas the first polygon
+def borderLines(width=1024, height=768, offset=4):
+    return [[(0-offset, 0-offset), (width+offset, 0-offset)],
+            [(width+offset, 0-offset), (width+offset, height+offset)],
+            [(width+offset, height+offset), (0-offset, height+offset)],
+            [(0-offset, height+offset), (0-offset, 0-offset)]]
+
+# percentile q (0-100) of a sorted list
+def percentile(values, q):
+    if not values: return 0
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+# digest of a set of polygons that does not depend on their order
+def polygonDigest(polygons):
+    return hashlib.sha1(repr(sorted(polygons)).encode()).hexdigest()[:12]
+
+# add the border and then the strokes to a fresh engine in order. Returns
+# the engine and one row of TIMING_HEADERS per stroke
+def replay(strokes, mergeDistance=0.5, duplicateDistance=2):
+    engine = StainedGlassEngine(mergeDistance, duplicateDistance)
+    for line in borderLines():
+        engine.add_line(line[0], line[1])
+    rows = []
+    for i, line in enumerate(strokes):
+        tic = perf_counter_ns()
+        result = engine.add_line(line[0], line[1])
+        total = perf_counter_ns() - tic
+        if result is None: # a repeated line, nothing but the duplicate check ran
+            newPolygons, replacedPolygons, stages = [], [], [0] * len(stained_glass_engine.STAGES)
+        else:
+            newPolygons, replacedPolygons = result
+            stages = [engine.latency.last(stage) for stage in stained_glass_engine.STAGES]
+        rows.append([i, line[0][0], line[0][1], line[1][0], line[1][1], int(result is not None),
+                     len(newPolygons), len(replacedPolygons), len(engine.points)]
+                    + [round(ns / 1e6, 4) for ns in [total] + stages])
+    return engine, rows
+
+# write the per-stroke timings and the final polygons of a session to outDir
+def saveReplay(outDir, name, engine, rows):
+    makedirs(outDir, exist_ok=True)
+    with open(path.join(outDir, name + "_replay_timings.csv"), 'w', newline='') as f:
+        w = writer(f)
+        w.writerow(TIMING_HEADERS)
+        w.writerows(rows)
+    with open(path.join(outDir, name + "_replay_polygons.json"), 'w') as f:
+        json.dump({"digest": polygonDigest(engine.polygons), "polygons": [list(p) for p in engine.polygons]}, f)
+
+# compare the final polygons with the ones saved by an earlier run. Returns
+# None if there is nothing to compare with, otherwise (missing, extra)
+def checkReplay(expectDir, name, engine):
+    expectPath = path.join(expectDir, name + "_replay_polygons.json")
+    if not path.exists(expectPath):
+        return None
+    with open(expectPath) as f:
+        expected = {tuple(tuple(v) for v in p) for p in json.load(f)["polygons"]}
+    polygons = set(engine.polygons)
+    return len(expected - polygons), len(polygons - expected)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay saved sessions without a display")
+    parser.add_argument("sessions", nargs="+", help="per-peck data .csv files")
+    parser.add_argument("--out-dir", help="write the per-stroke timings and final polygons here")
+    parser.add_argument("--expect", help="folder of an earlier --out-dir to check the polygons against")
+    parser.add_argument("--distance", type=float, default=0.5, help="MERGE_DISTANCE (default: 0.5)")
+    parser.add_argument("--duplicate-distance", type=float, default=2, help="DUPLICATE_LINE_DISTANCE (default: 2)")
+    args = parser.parse_args()
+
+    print(f"{'session':<40}{'strokes':>8}{'dup':>5}{'polygons':>9}{'showing':>9}{'vertices':>9}"
+          f"{'total s':>9}{'mean ms':>9}{'p95 ms':>9}{'max ms':>9}  digest")
+    mismatched = 0
+    for csvPath in args.sessions:
+        name = path.splitext(path.basename(csvPath))[0]
+        strokes = loadStrokes(csvPath)
+        engine, rows = replay(strokes, args.distance, args.duplicate_distance)
+        times = sorted(row[9] for row in rows)
+        duplicates = sum(1 for row in rows if not row[5])
+        print(f"{name[-40:]:<40}{len(strokes):>8}{duplicates:>5}{len(engine.polygons):>9}{len(engine.showing):>9}{len(engine.points):>9}"
+              f"{sum(times) / 1000:>9.2f}{sum(times) / max(len(times), 1):>9.2f}{percentile(times, 95):>9.2f}"
+              f"{(times[-1] if times else 0):>9.2f}  {polygonDigest(engine.polygons)}", end="")
+        if args.expect:
+            result = checkReplay(args.expect, name, engine)
+            if result is None:
+                print("  (nothing to compare)", end="")
+            elif result != (0, 0):
+                mismatched += 1
+                print(f"  DIFFERS: {result[0]} missing, {result[1]} extra", end="")
+            else:
+                print("  same", end="")
+        print()
+        if args.out_dir:
+            saveReplay(args.out_dir, name, engine, rows)
+
+    if mismatched:
+        print(f"\n{mismatched} session(s) ended with different polygons")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# P033c - Pigeon Art w/ Stained Glass
+
+# Replays the strokes of saved sessions with and without vertex merging
+# (MERGE_DISTANCE in noahs_art_program.py) and reports how many vertices,
+# wedges and faces the merging saves. Strokes are rebuilt from the per-peck
+# data .csv files: every second peck ends the line started by the peck
+# before it, the same way onLeftButton pairs them up, and are drawn after
+# the border lines Paint starts with.
+
+# Usage: python vertex_merge_report.py SESSION.csv [SESSION.csv ...] [--distance D]
+
+# Last edited: 2026-10-17
+
+# Import libraries
+import argparse
+
+from session_replay import loadStrokes, borderLines
+from stained_glass_engine import StainedGlassEngine
+
+# add all strokes to a fresh engine and count what the graph ended up with
+def replay(strokes, distance):
+    engine = StainedGlassEngine(mergeDistance=distance)
+    for line in borderLines() + strokes:
+        engine.add_line(line[0], line[1])
+    return {
+        "vertices": len(engine.points),
+        "wedges": sum(len(rot) for rot in engine.regionEngine.rotation.values()), # one wedge per directed edge
+        "faces": len(engine.regionEngine.regions()),
+        "polygons": len(engine.polygons),
+        "merged": engine.vertexIndex.merged,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Report what vertex merging saves on session replays")
+    parser.add_argument("sessions", nargs="+", help="per-peck data .csv files")
+    parser.add_argument("--distance", type=float, default=0.5,
+                        help="merge distance in pixels (default: 0.5, as MERGE_DISTANCE)")
+    args = parser.parse_args()
+
+    keys = ("vertices", "wedges", "faces", "polygons")
+    totals = {k: [0, 0] for k in keys}
+    print(f"{'session':<40}{'strokes':>8}{'merged':>8}" + "".join(f"{k + ' (off/on)':>22}" for k in keys))
+    for csvPath in args.sessions:
+        strokes = loadStrokes(csvPath)
+        off = replay(strokes, 0)
+        on = replay(strokes, args.distance)
+        for k in keys:
+            totals[k][0] += off[k]
+            totals[k][1] += on[k]
+        name = csvPath.replace("\\", "/").split("/")[-1][-40:]
+        print(f"{name:<40}{len(strokes):>8}{on['merged']:>8}" + "".join(f"{f'{off[k]}/{on[k]}':>22}" for k in keys))
+
+    print()
+    for k in keys:
+        off, on = totals[k]
+        saved = off - on
+        print(f"{k}: {off} -> {on}, {saved} saved ({100 * saved / off if off else 0:.1f}%)")
+
+if __name__ == "__main__":
+    main()